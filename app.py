@@ -1,4 +1,5 @@
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import os
 try:
     from dotenv import load_dotenv
@@ -6,18 +7,11 @@ except Exception:
     # Allow app to start even if python-dotenv is not installed in the environment.
     def load_dotenv(*args, **kwargs):
         return None
+from collections import deque
 from datetime import datetime
-try:
-    import plotly.express as px
-    import plotly.graph_objects as go
-    PLOTLY_AVAILABLE = True
-except Exception:
-    px = None
-    go = None
-    PLOTLY_AVAILABLE = False
-    print("Plotly not available - charts will be disabled")
 
 # Import backend modules
+from backend.llm_handler import configure_http_pool
 from backend.response_generator import ResponseGenerator
 from backend.mood_tracker import MoodTracker
 from utils.helpers import (
@@ -30,14 +24,14 @@ from utils.helpers import (
 
 # Import new feature modules
 try:
-    from utils.voice_handler import VoiceHandler, SUPPORTED_LANGUAGES
+    from utils.voice_handler import get_voice_handler, SUPPORTED_LANGUAGES
     VOICE_AVAILABLE = True
 except Exception:
     VOICE_AVAILABLE = False
     print("Voice features unavailable - install SpeechRecognition and PyAudio")
 
 try:
-    from utils.translator import TranslationHandler, LANGUAGE_EMOJIS
+    from utils.translator import get_translation_handler, get_language_emoji
     TRANSLATION_AVAILABLE = True
 except Exception:
     TRANSLATION_AVAILABLE = False
@@ -48,6 +42,10 @@ from utils.journal_exporter import JournalExporter
 # Load environment variables
 load_dotenv()
 
+# Chat history kept in the session, and how much of it is sent as LLM context
+MAX_MESSAGES = 200
+CONTEXT_MESSAGES = 20
+
 # Page configuration
 st.set_page_config(
     page_title="MindfulCompanion - AI Wellness Chatbot",
@@ -56,8 +54,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource(show_spinner=False)
+def _configure_http() -> bool:
+    """Pooled HTTP connections for the Hugging Face client, set up once per process"""
+    return configure_http_pool()
+
+_configure_http()
+
 # Custom CSS
-st.markdown("""
+@st.cache_resource
+def _css() -> str:
+    return """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -116,12 +123,119 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_css(), unsafe_allow_html=True)
+
+def _render_message(message: dict) -> str:
+    """Render one chat message as an HTML snippet"""
+    timestamp = message.get('timestamp', '')
+    if message['role'] == 'user':
+        return (
+            "<div class='chat-message user-message'>\n"
+            f"<strong>You</strong> <span style='color: #999;'>{timestamp}</span><br>\n"
+            f"{message['content']}\n"
+            "</div>"
+        )
+    
+    emotion = message.get('emotion', 'neutral')
+    emoji = message.get('emoji', '💭')
+    color = message.get('color', '#808080')
+    return (
+        "<div class='chat-message bot-message'>\n"
+        f"<strong>MindfulCompanion</strong> <span style='color: #999;'>{timestamp}</span>\n"
+        f"<span class='emotion-badge' style='background-color: {color}20; color: {color};'>"
+        f"{emoji} {emotion.title()}</span><br>\n"
+        f"{message['content']}\n"
+        "</div>"
+    )
+
+@st.cache_data(show_spinner=False)
+def _distribution_chart(distribution: tuple, mark: str, title: str) -> tuple:
+    """Build a Vega-Lite spec and its data for a (label, count) distribution"""
+    data = {
+        "label": [label for label, _ in distribution],
+        "count": [count for _, count in distribution]
+    }
+    if mark == "arc":
+        encoding = {
+            "theta": {"field": "count", "type": "quantitative"},
+            "color": {"field": "label", "type": "nominal", "title": None}
+        }
+    else:
+        encoding = {
+            "x": {"field": "label", "type": "nominal", "title": "Sentiment"},
+            "y": {"field": "count", "type": "quantitative", "title": "Count"}
+        }
+    spec = {"title": title, "mark": mark, "encoding": encoding}
+    return data, spec
+
+def _handle_user_input(user_input: str, now_str: str) -> None:
+    """Record a user message, generate the reply, log the mood and rerun the chat"""
+    # Add user message (rendered once here, not on every rerun)
+    user_message = {
+        'role': 'user',
+        'content': user_input,
+        'timestamp': now_str
+    }
+    user_message['html'] = _render_message(user_message)
+    st.session_state.messages.append(user_message)
+    
+    # Generate response (emotion + prompt first, the reply streams in below)
+    with st.spinner("Thinking..."):
+        response_data = st.session_state.response_generator.generate_stream(
+            user_message=user_input,
+            conversation_context=list(st.session_state.messages)[-CONTEXT_MESSAGES:]
+        )
+    
+    # Check if crisis detected
+    if response_data.get('metadata', {}).get('is_crisis', False):
+        st.markdown("""
+        <div class='crisis-alert'>
+            <h4>⚠️ Crisis Resources</h4>
+            <p>It seems you might be going through a crisis. Please reach out to professional help immediately.</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Show the reply as it arrives; it is re-rendered as a styled message on rerun
+    reply = st.write_stream(response_data['response'])
+    # If the safety filter cut in mid-stream, keep only its safe alternative
+    reply = response_data.get('final_response', reply)
+    
+    # Log mood
+    st.session_state.mood_tracker.log_mood(
+        emotion=response_data['emotion'],
+        confidence=response_data['emotion_confidence'],
+        sentiment=response_data['sentiment'],
+        intensity=response_data['intensity'],
+        message=user_input,
+        session_id=st.session_state.session_id
+    )
+    
+    # Add bot response
+    bot_message = {
+        'role': 'assistant',
+        'content': reply,
+        'emotion': response_data['emotion'],
+        'emoji': response_data['emoji'],
+        'color': response_data['color'],
+        'timestamp': now_str
+    }
+    bot_message['html'] = _render_message(bot_message)
+    st.session_state.messages.append(bot_message)
+    st.session_state.turn_count += 1
+    
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Called during a full-app run (e.g. first render), rerun everything
+        st.rerun()
 
 # Initialize session state
 if 'initialized' not in st.session_state:
     st.session_state.initialized = True
-    st.session_state.messages = []
+    st.session_state.messages = deque(maxlen=MAX_MESSAGES)
+    st.session_state.turn_count = 0
     st.session_state.session_id = generate_session_id()
     st.session_state.mood_tracker = MoodTracker()
     
@@ -135,12 +249,12 @@ if 'initialized' not in st.session_state:
     st.session_state.journal_exporter = JournalExporter(st.session_state.mood_tracker)
     
     if VOICE_AVAILABLE:
-        st.session_state.voice_handler = VoiceHandler()
+        st.session_state.voice_handler = get_voice_handler()
     else:
         st.session_state.voice_handler = None
     
     if TRANSLATION_AVAILABLE:
-        st.session_state.translator = TranslationHandler()
+        st.session_state.translator = get_translation_handler()
     else:
         st.session_state.translator = None
     
@@ -163,7 +277,10 @@ with st.sidebar:
             help="Enter your Hugging Face API key for better responses. Get one at https://huggingface.co/settings/tokens"
         )
         if api_key_input:
-            st.session_state.response_generator = ResponseGenerator(api_key_input)
+            # Only rebuild the generator when the key actually changes
+            if api_key_input != st.session_state.get('_last_api_key'):
+                st.session_state._last_api_key = api_key_input
+                st.session_state.response_generator = ResponseGenerator(api_key_input)
             st.success("✅ API key configured!")
     else:
         st.success("✅ API key loaded from environment")
@@ -185,7 +302,7 @@ with st.sidebar:
         st.session_state.user_language = languages[selected_lang]
         
         if st.session_state.user_language != "en":
-            lang_emoji = LANGUAGE_EMOJIS.get(st.session_state.user_language, "🌐")
+            lang_emoji = get_language_emoji(st.session_state.user_language)
             st.info(f"{lang_emoji} Translation enabled for {selected_lang}")
         
         st.markdown("---")
@@ -269,8 +386,10 @@ with st.sidebar:
     
     # Reset conversation
     if st.button("🔄 New Conversation", use_container_width=True):
-        st.session_state.messages = []
+        st.session_state.messages = deque(maxlen=MAX_MESSAGES)
         st.session_state.response_generator.reset_conversation()
+        if st.session_state.translator is not None:
+            st.session_state.translator.reset_language_detection()
         st.session_state.session_id = generate_session_id()
         st.rerun()
     
@@ -320,6 +439,82 @@ with st.sidebar:
     *Not medical advice*
     """)
 
+@st.fragment
+def _chat_fragment():
+    """Chat history, quick responses and input; sending a message reruns only this block"""
+    # One timestamp per rerun, shared by the welcome message and both sides of a turn
+    now_str = format_timestamp()
+    
+    # Display chat messages
+    chat_container = st.container()
+    with chat_container:
+        if not st.session_state.messages:
+            # Welcome message
+            greeting = get_time_based_greeting()
+            st.markdown(f"""
+            <div class='chat-message bot-message'>
+                <strong>MindfulCompanion</strong> <span style='color: #999;'>{now_str}</span><br>
+                {greeting} I'm here to listen and support you. How are you feeling today?
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            # Display conversation history (pre-rendered at append time) in a single element
+            st.markdown(
+                "\n\n".join(message.get('html') or _render_message(message)
+                             for message in st.session_state.messages),
+                unsafe_allow_html=True
+            )
+    
+    # Quick suggestion buttons
+    st.markdown("### 💬 Quick Responses")
+    if st.session_state.messages:
+        last_emotion = st.session_state.messages[-1].get('emotion', 'neutral')
+    else:
+        last_emotion = 'neutral'
+    
+    suggestions = st.session_state.response_generator.get_suggestions(last_emotion)
+    
+    cols = st.columns(len(suggestions))
+    for idx, suggestion in enumerate(suggestions):
+        with cols[idx]:
+            if st.button(suggestion, key=f"suggestion_{idx}", use_container_width=True):
+                _handle_user_input(suggestion, now_str)
+    
+    st.markdown("---")
+    
+    # Voice input section with fallback
+    st.markdown("### 💬 Chat Input")
+    
+    input_col1, input_col2 = st.columns([4, 1])
+    
+    with input_col1:
+        user_input = st.chat_input("Type your message here...")
+    
+    with input_col2:
+        if st.session_state.voice_enabled and st.button("🎤", help="Voice input (text fallback if PyAudio not installed)", use_container_width=True):
+            with st.spinner("🎤 Listening..."):
+                # Get the selected voice language
+                voice_lang_name = st.session_state.get("voice_language", "English (US)")
+                voice_lang_code = SUPPORTED_LANGUAGES.get(voice_lang_name, "en-US")
+                
+                # Attempt voice recognition
+                success, text, message = st.session_state.voice_handler.listen(language=voice_lang_code)
+                
+                if success and text:
+                    # Use recognized text as input
+                    user_input = text
+                    st.success(f"✅ Heard: {text}")
+                else:
+                    # Show error and provide text fallback option
+                    if "PyAudio" in message:
+                        st.warning(message)
+                        st.info("💡 PyAudio is required for voice input on Windows. For now, please type your message in the chat box above.")
+                    else:
+                        st.error(message)
+    
+    if user_input:
+        _handle_user_input(user_input, now_str)
+
 # Main content area
 if 'show_dashboard' in st.session_state and st.session_state.show_dashboard:
     # Mood Dashboard View
@@ -329,9 +524,14 @@ if 'show_dashboard' in st.session_state and st.session_state.show_dashboard:
         st.session_state.show_dashboard = False
         st.rerun()
     
-    # Get mood data
-    mood_stats = st.session_state.mood_tracker.get_mood_statistics(days=30)
-    mood_trends = st.session_state.mood_tracker.get_mood_trends(days=30)
+    # Get mood data (recomputed only after new messages have been logged)
+    bundle_key = (st.session_state.session_id, st.session_state.turn_count)
+    if st.session_state.get('dashboard_bundle_key') != bundle_key:
+        st.session_state.dashboard_bundle = st.session_state.mood_tracker.get_dashboard_bundle(days=30, limit=20)
+        st.session_state.dashboard_bundle_key = bundle_key
+    
+    mood_stats = st.session_state.dashboard_bundle['stats']
+    mood_trends = st.session_state.dashboard_bundle['trends']
     
     # Summary cards
     col1, col2, col3, col4 = st.columns(4)
@@ -380,30 +580,15 @@ if 'show_dashboard' in st.session_state and st.session_state.show_dashboard:
         st.subheader("Emotion Distribution")
         emotion_dist = mood_stats.get('emotion_distribution', {})
         if emotion_dist:
-            if PLOTLY_AVAILABLE and px is not None:
-                fig = px.pie(
-                    names=list(emotion_dist.keys()),
-                    values=list(emotion_dist.values()),
-                    title="Emotions Over Last 30 Days"
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Emotion distribution chart unavailable (plotly not installed)")
+            data, spec = _distribution_chart(tuple(emotion_dist.items()), "arc", "Emotions Over Last 30 Days")
+            st.vega_lite_chart(data, spec, use_container_width=True)
     
     with col2:
         st.subheader("Sentiment Breakdown")
         sentiment_dist = mood_stats.get('sentiment_distribution', {})
         if sentiment_dist:
-            if PLOTLY_AVAILABLE and px is not None:
-                fig = px.bar(
-                    x=list(sentiment_dist.keys()),
-                    y=list(sentiment_dist.values()),
-                    title="Sentiment Distribution",
-                    labels={'x': 'Sentiment', 'y': 'Count'}
-                )
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("Sentiment distribution chart unavailable (plotly not installed)")
+            data, spec = _distribution_chart(tuple(sentiment_dist.items()), "bar", "Sentiment Distribution")
+            st.vega_lite_chart(data, spec, use_container_width=True)
     
     # Insights
     st.markdown("---")
@@ -418,7 +603,7 @@ if 'show_dashboard' in st.session_state and st.session_state.show_dashboard:
     # Recent mood history
     st.markdown("---")
     st.subheader("📜 Recent Mood Logs")
-    recent_moods = st.session_state.mood_tracker.get_recent_moods(days=30, limit=20)
+    recent_moods = st.session_state.dashboard_bundle['recent']
     if not recent_moods.empty:
         st.dataframe(
             recent_moods[['date', 'time', 'emotion', 'sentiment', 'intensity', 'message_preview']],
@@ -440,171 +625,7 @@ else:
     </div>
     """, unsafe_allow_html=True)
     
-    # Display chat messages
-    chat_container = st.container()
-    with chat_container:
-        if not st.session_state.messages:
-            # Welcome message
-            greeting = get_time_based_greeting()
-            st.markdown(f"""
-            <div class='chat-message bot-message'>
-                <strong>MindfulCompanion</strong> <span style='color: #999;'>{format_timestamp()}</span><br>
-                {greeting} I'm here to listen and support you. How are you feeling today?
-            </div>
-            """, unsafe_allow_html=True)
-        
-        # Display conversation history
-        for message in st.session_state.messages:
-            if message['role'] == 'user':
-                st.markdown(f"""
-                <div class='chat-message user-message'>
-                    <strong>You</strong> <span style='color: #999;'>{message.get('timestamp', '')}</span><br>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                emotion = message.get('emotion', 'neutral')
-                emoji = message.get('emoji', '💭')
-                color = message.get('color', '#808080')
-                
-                st.markdown(f"""
-                <div class='chat-message bot-message'>
-                    <strong>MindfulCompanion</strong> <span style='color: #999;'>{message.get('timestamp', '')}</span>
-                    <span class='emotion-badge' style='background-color: {color}20; color: {color};'>
-                        {emoji} {emotion.title()}
-                    </span><br>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
-    
-    # Quick suggestion buttons
-    st.markdown("### 💬 Quick Responses")
-    if st.session_state.messages:
-        last_emotion = st.session_state.messages[-1].get('emotion', 'neutral')
-    else:
-        last_emotion = 'neutral'
-    
-    suggestions = st.session_state.response_generator.get_suggestions(last_emotion)
-    
-    cols = st.columns(len(suggestions))
-    for idx, suggestion in enumerate(suggestions):
-        with cols[idx]:
-            if st.button(suggestion, key=f"suggestion_{idx}", use_container_width=True):
-                # Trigger the suggestion as user input
-                user_input = suggestion
-                
-                # Process the message (same logic as below)
-                st.session_state.messages.append({
-                    'role': 'user',
-                    'content': user_input,
-                    'timestamp': format_timestamp()
-                })
-                
-                with st.spinner("Thinking..."):
-                    response_data = st.session_state.response_generator.generate(
-                        user_message=user_input,
-                        conversation_context=st.session_state.messages
-                    )
-                    
-                    # Log mood
-                    st.session_state.mood_tracker.log_mood(
-                        emotion=response_data['emotion'],
-                        confidence=response_data['emotion_confidence'],
-                        sentiment=response_data['sentiment'],
-                        intensity=response_data['intensity'],
-                        message=user_input,
-                        session_id=st.session_state.session_id
-                    )
-                    
-                    # Add bot response
-                    st.session_state.messages.append({
-                        'role': 'assistant',
-                        'content': response_data['response'],
-                        'emotion': response_data['emotion'],
-                        'emoji': response_data['emoji'],
-                        'color': response_data['color'],
-                        'timestamp': format_timestamp()
-                    })
-                
-                st.rerun()
-    
-    st.markdown("---")
-    
-    # Voice input section with fallback
-    st.markdown("### 💬 Chat Input")
-    
-    input_col1, input_col2 = st.columns([4, 1])
-    
-    with input_col1:
-        user_input = st.chat_input("Type your message here...")
-    
-    with input_col2:
-        if st.session_state.voice_enabled and st.button("🎤", help="Voice input (text fallback if PyAudio not installed)", use_container_width=True):
-            with st.spinner("🎤 Listening..."):
-                # Get the selected voice language
-                voice_lang_name = st.session_state.get("voice_language", "English (US)")
-                voice_lang_code = SUPPORTED_LANGUAGES.get(voice_lang_name, "en-US")
-                
-                # Attempt voice recognition
-                success, text, message = st.session_state.voice_handler.listen(language=voice_lang_code)
-                
-                if success and text:
-                    # Use recognized text as input
-                    user_input = text
-                    st.success(f"✅ Heard: {text}")
-                else:
-                    # Show error and provide text fallback option
-                    if "PyAudio" in message:
-                        st.warning(message)
-                        st.info("💡 PyAudio is required for voice input on Windows. For now, please type your message in the chat box above.")
-                    else:
-                        st.error(message)
-    
-    if user_input:
-        # Add user message
-        st.session_state.messages.append({
-            'role': 'user',
-            'content': user_input,
-            'timestamp': format_timestamp()
-        })
-        
-        # Generate response
-        with st.spinner("Thinking..."):
-            response_data = st.session_state.response_generator.generate(
-                user_message=user_input,
-                conversation_context=st.session_state.messages
-            )
-            
-            # Check if crisis detected
-            if response_data.get('metadata', {}).get('is_crisis', False):
-                st.markdown("""
-                <div class='crisis-alert'>
-                    <h4>⚠️ Crisis Resources</h4>
-                    <p>It seems you might be going through a crisis. Please reach out to professional help immediately.</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            # Log mood
-            st.session_state.mood_tracker.log_mood(
-                emotion=response_data['emotion'],
-                confidence=response_data['emotion_confidence'],
-                sentiment=response_data['sentiment'],
-                intensity=response_data['intensity'],
-                message=user_input,
-                session_id=st.session_state.session_id
-            )
-            
-            # Add bot response
-            st.session_state.messages.append({
-                'role': 'assistant',
-                'content': response_data['response'],
-                'emotion': response_data['emotion'],
-                'emoji': response_data['emoji'],
-                'color': response_data['color'],
-                'timestamp': format_timestamp()
-            })
-        
-        st.rerun()
+    _chat_fragment()
 
 # Footer
 st.markdown("---")
@@ -1,22 +1,76 @@
 import re
-from typing import Dict, Tuple
-try:
-    from textblob import TextBlob
-    HAS_TEXTBLOB = True
-except Exception:
-    HAS_TEXTBLOB = False
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import Dict, List, Optional, Tuple
 
-import nltk
+import numpy as np
+import pandas as pd
 
-# Download required NLTK data (run once) if available
-try:
-    nltk.data.find('tokenizers/punkt')
-except Exception:
+from utils.helpers import EMOTION_COLORS
+
+# TextBlob is imported on first use; its sentiment analyzer does not need
+# the NLTK punkt tokenizer, so no corpus download is triggered at import
+HAS_TEXTBLOB = find_spec("textblob") is not None
+
+# Intensity buckets, indexed by the codes returned from _score_intensity
+INTENSITY_LEVELS = ("low", "medium", "high")
+
+# Display emoji per emotion
+EMOTION_EMOJIS = {
+    "sad": "😢",
+    "anxious": "😰",
+    "angry": "😠",
+    "happy": "😊",
+    "fearful": "😨",
+    "confused": "😕",
+    "neutral": "😐"
+}
+
+def _score_intensity(high_count: int,
+                     exclamation_count: int,
+                     caps_ratio: float,
+                     subjectivity: float,
+                     low_count: int) -> int:
+    """Combine intensity features into a code for INTENSITY_LEVELS"""
+    intensity_score = (
+        high_count * 2 +
+        exclamation_count * 1.5 +
+        caps_ratio * 10 +
+        subjectivity * 2 -
+        low_count * 2
+    )
+    
+    if intensity_score > 5:
+        return 2
+    elif intensity_score > 2:
+        return 1
+    else:
+        return 0
+
+def _score_intensity_batch(high_count: np.ndarray,
+                           exclamation_count: np.ndarray,
+                           caps_ratio: np.ndarray,
+                           subjectivity: np.ndarray,
+                           low_count: np.ndarray) -> np.ndarray:
+    """Vectorized _score_intensity over equal-length feature arrays (int8 codes)"""
+    intensity_score = (
+        high_count * 2 +
+        exclamation_count * 1.5 +
+        caps_ratio * 10 +
+        subjectivity * 2 -
+        low_count * 2
+    )
+    return (intensity_score > 2).astype(np.int8) + (intensity_score > 5)
+
+@lru_cache(maxsize=512)
+def _sentiment(text: str) -> Tuple[float, float]:
+    """TextBlob (polarity, subjectivity) for text, memoized since it is deterministic"""
     try:
-        nltk.download('punkt', quiet=True)
+        from textblob import TextBlob
+        sentiment = TextBlob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
     except Exception:
-        # If download fails (offline environment), continue without it
-        pass
+        return 0.0, 0.0
 
 class EmotionDetector:
     """
@@ -26,6 +80,19 @@ class EmotionDetector:
     - Context awareness
     """
     
+    # Common short replies that carry no emotion keywords and no sentiment
+    _NEUTRAL_CACHE = frozenset({
+        "yes", "no", "yeah", "yep", "nope", "hi", "hello", "hey", "bye",
+        "k", "hmm", "idk", "maybe", "alright", "nothing", "i see",
+        "thank you", "thx", "ugh", "hm"
+    })
+    
+    # Maps ASCII uppercase bytes to 0x01 and everything else to 0x00
+    _UPPER_TABLE = bytes.maketrans(
+        bytes(range(256)),
+        bytes(1 if chr(i).isupper() and i < 128 else 0 for i in range(256))
+    )
+    
     def __init__(self):
         # Emotion keyword dictionaries
         self.emotion_keywords = {
@@ -63,11 +130,60 @@ class EmotionDetector:
             "high": ["very", "extremely", "incredibly", "so", "really", "absolutely"],
             "low": ["a bit", "slightly", "somewhat", "kind of", "sort of"]
         }
+        
+        # Fallback polarity words (used when TextBlob is unavailable)
+        self.polarity_words = {
+            "positive": [
+                "happy", "joy", "good", "great", "wonderful", "amazing", "love",
+                "glad", "fantastic", "pleased", "excited", "grateful"
+            ],
+            "negative": [
+                "sad", "depressed", "bad", "terrible", "awful", "hate", "angry",
+                "miserable", "lonely", "upset", "anxious", "worried"
+            ]
+        }
+        
+        # Tag every keyword with the buckets it counts towards so a message
+        # only has to be scanned once
+        self._keyword_tags = {}
+        for group, buckets in (("emotion", self.emotion_keywords),
+                               ("intensity", self.intensity_words),
+                               ("polarity", self.polarity_words)):
+            for bucket, words in buckets.items():
+                for word in words:
+                    self._keyword_tags.setdefault(word, []).append((group, bucket))
+        
+        # Keywords count wherever a word starts with them ("sadness", "panicky"),
+        # found with one alternation. The lookahead tries every word start, the
+        # longest keyword wins, and shorter keywords it begins with count too
+        # ("so" in "somewhat").
+        keywords = sorted(self._keyword_tags, key=len, reverse=True)
+        self._keyword_pattern = re.compile(r"\b(?=(" + "|".join(map(re.escape, keywords)) + "))")
+        self._keyword_prefixes = {
+            word: [other for other in keywords if word.startswith(other)] for word in keywords
+        }
+    
+    def _count_keywords(self, text_lower: str) -> Dict[Tuple[str, str], int]:
+        """Count distinct keyword hits per (group, bucket) tag in one pass"""
+        
+        matched = set()
+        for match in self._keyword_pattern.finditer(text_lower):
+            matched.update(self._keyword_prefixes[match.group(1)])
+        
+        counts = {}
+        for word in matched:
+            for tag in self._keyword_tags[word]:
+                counts[tag] = counts.get(tag, 0) + 1
+        return counts
     
-    def detect_emotion(self, text: str) -> Dict[str, any]:
+    def detect_emotion(self, text: str, text_lower: Optional[str] = None) -> Dict[str, any]:
         """
         Analyze text and return emotion data
         
+        Args:
+            text: Message to analyze
+            text_lower: Lowercased text, if the caller already has it
+        
         Returns:
             Dict containing:
             - primary_emotion: Main detected emotion
@@ -76,31 +192,24 @@ class EmotionDetector:
             - intensity: low/medium/high
         """
         
-        text_lower = text.lower()
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        # Fast path: no letters at all, or a stock short reply
+        if text_lower.strip(" .!?") in self._NEUTRAL_CACHE or not any(c.isalpha() for c in text):
+            return self._neutral_result(text_lower)
+        
+        counts = self._count_keywords(text_lower)
         
         # Calculate sentiment using TextBlob if available, otherwise use a lightweight fallback
         if HAS_TEXTBLOB:
-            try:
-                blob = TextBlob(text)
-                polarity = blob.sentiment.polarity  # -1 (negative) to 1 (positive)
-                subjectivity = blob.sentiment.subjectivity  # 0 (objective) to 1 (subjective)
-            except Exception:
-                polarity = 0.0
-                subjectivity = 0.0
+            # polarity: -1 (negative) to 1 (positive)
+            # subjectivity: 0 (objective) to 1 (subjective)
+            polarity, subjectivity = _sentiment(text)
         else:
             # Fallback: simple polarity score based on keyword matching
-            positive_words = [
-                "happy", "joy", "good", "great", "wonderful", "amazing", "love",
-                "glad", "fantastic", "pleased", "excited", "grateful"
-            ]
-            negative_words = [
-                "sad", "depressed", "bad", "terrible", "awful", "hate", "angry",
-                "miserable", "lonely", "upset", "anxious", "worried"
-            ]
-
-            text_lower = text.lower()
-            pos_count = sum(1 for w in positive_words if w in text_lower)
-            neg_count = sum(1 for w in negative_words if w in text_lower)
+            pos_count = counts.get(("polarity", "positive"), 0)
+            neg_count = counts.get(("polarity", "negative"), 0)
 
             if pos_count + neg_count == 0:
                 polarity = 0.0
@@ -109,12 +218,12 @@ class EmotionDetector:
 
             subjectivity = 0.0
         
-        # Count keyword matches for each emotion
-        emotion_scores = {}
-        for emotion, keywords in self.emotion_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
-            if score > 0:
-                emotion_scores[emotion] = score
+        # Keyword matches for each emotion (in declaration order for tie-breaking)
+        emotion_scores = {
+            emotion: counts[("emotion", emotion)]
+            for emotion in self.emotion_keywords
+            if ("emotion", emotion) in counts
+        }
         
         # Determine primary emotion
         if emotion_scores:
@@ -133,7 +242,7 @@ class EmotionDetector:
                 confidence = 0.5
         
         # Determine intensity
-        intensity = self._calculate_intensity(text_lower, subjectivity)
+        intensity = self._calculate_intensity(text_lower, subjectivity, counts)
         
         # Determine sentiment category
         if polarity > 0.1:
@@ -152,55 +261,118 @@ class EmotionDetector:
             "subjectivity": round(float(subjectivity), 2)
         }
     
-    def _calculate_intensity(self, text: str, subjectivity: float) -> str:
+    def _calculate_intensity(self, text: str, subjectivity: float,
+                             counts: Dict[Tuple[str, str], int]) -> str:
         """Calculate emotional intensity"""
         
-        # Check for intensity modifiers
-        high_count = sum(1 for word in self.intensity_words["high"] if word in text)
-        low_count = sum(1 for word in self.intensity_words["low"] if word in text)
+        # Intensity modifiers (counted by _count_keywords)
+        high_count = counts.get(("intensity", "high"), 0)
+        low_count = counts.get(("intensity", "low"), 0)
         
         # Check for capitalization and exclamation marks
-        caps_ratio = sum(1 for c in text if c.isupper()) / max(len(text), 1)
+        caps_ratio = self._caps_ratio(text)
         exclamation_count = text.count('!')
         
-        # Calculate intensity score
-        intensity_score = (
-            high_count * 2 +
-            exclamation_count * 1.5 +
-            caps_ratio * 10 +
-            subjectivity * 2 -
-            low_count * 2
-        )
+        code = _score_intensity(high_count, exclamation_count, caps_ratio, subjectivity, low_count)
+        return INTENSITY_LEVELS[code]
+    
+    def _neutral_result(self, text: str) -> Dict[str, any]:
+        """Result for (lowercased) text without keywords or sentiment; only '!' affects intensity"""
+        intensity_code = _score_intensity(0, text.count('!'), self._caps_ratio(text), 0.0, 0)
+        return {
+            "primary_emotion": "neutral",
+            "confidence": 0.5,
+            "sentiment": "neutral",
+            "intensity": INTENSITY_LEVELS[intensity_code],
+            "polarity": 0.0,
+            "subjectivity": 0.0
+        }
+    
+    def _caps_ratio(self, text: str) -> float:
+        """Share of uppercase characters in text"""
+        if text.isascii():
+            caps_count = text.encode('ascii').translate(self._UPPER_TABLE).count(b'\x01')
+        else:
+            caps_count = sum(map(str.isupper, text))
+        return caps_count / max(len(text), 1)
+    
+    def detect_emotion_batch(self, texts: List[str]) -> pd.DataFrame:
+        """
+        Analyze many texts at once (e.g. rescoring a whole journal)
+        
+        Keyword matching runs once per text; emotion selection, confidence,
+        sentiment and intensity are then computed for all rows with NumPy.
+        
+        Returns:
+            DataFrame with one row per text and the same fields as detect_emotion
+        """
         
-        if intensity_score > 5:
-            return "high"
-        elif intensity_score > 2:
-            return "medium"
+        columns = ["primary_emotion", "confidence", "sentiment", "intensity",
+                   "polarity", "subjectivity"]
+        if not texts:
+            return pd.DataFrame(columns=columns)
+        
+        emotions = list(self.emotion_keywords)
+        tags = [("emotion", emotion) for emotion in emotions] + [
+            ("intensity", "high"), ("intensity", "low"),
+            ("polarity", "positive"), ("polarity", "negative")
+        ]
+        tag_index = {tag: i for i, tag in enumerate(tags)}
+        
+        # Per-text features: keyword hit matrix plus the character-level counts
+        hits = np.zeros((len(texts), len(tags)), dtype=np.int16)
+        caps_ratio = np.empty(len(texts))
+        exclamation_count = np.empty(len(texts))
+        for row, text in enumerate(texts):
+            text_lower = text.lower()
+            for tag, count in self._count_keywords(text_lower).items():
+                hits[row, tag_index[tag]] = count
+            caps_ratio[row] = self._caps_ratio(text_lower)
+            exclamation_count[row] = text.count('!')
+        
+        emotion_hits = hits[:, :len(emotions)]
+        high_count, low_count, pos_count, neg_count = hits[:, len(emotions):].T
+        
+        if HAS_TEXTBLOB:
+            polarity, subjectivity = np.array([_sentiment(text) for text in texts]).T
         else:
-            return "low"
+            total = pos_count + neg_count
+            polarity = np.where(total == 0, 0.0, (pos_count - neg_count) / np.maximum(total, 1))
+            subjectivity = np.zeros(len(texts))
+        
+        # Keyword winner (argmax keeps declaration order on ties), else sentiment fallback
+        best = emotion_hits.argmax(axis=1)
+        best_hits = emotion_hits[np.arange(len(texts)), best]
+        has_keywords = best_hits > 0
+        primary_emotion = np.where(
+            has_keywords,
+            np.array(emotions)[best],
+            np.select([polarity > 0.3, polarity < -0.3], ["happy", "sad"], "neutral")
+        )
+        confidence = np.where(
+            has_keywords,
+            np.minimum(best_hits * 0.25, 1.0),
+            np.where(np.abs(polarity) > 0.3, np.abs(polarity), 0.5)
+        )
+        
+        intensity_codes = _score_intensity_batch(
+            high_count, exclamation_count, caps_ratio, subjectivity, low_count
+        )
+        sentiment = np.select([polarity > 0.1, polarity < -0.1], ["positive", "negative"], "neutral")
+        
+        return pd.DataFrame({
+            "primary_emotion": primary_emotion,
+            "confidence": [round(float(value), 2) for value in confidence],
+            "sentiment": sentiment,
+            "intensity": np.array(INTENSITY_LEVELS)[intensity_codes],
+            "polarity": [round(float(value), 2) for value in polarity],
+            "subjectivity": [round(float(value), 2) for value in subjectivity]
+        }, columns=columns)
     
     def get_emotion_emoji(self, emotion: str) -> str:
         """Return emoji for emotion"""
-        emoji_map = {
-            "sad": "😢",
-            "anxious": "😰",
-            "angry": "😠",
-            "happy": "😊",
-            "fearful": "😨",
-            "confused": "😕",
-            "neutral": "😐"
-        }
-        return emoji_map.get(emotion, "💭")
+        return EMOTION_EMOJIS.get(emotion, "💭")
     
     def get_emotion_color(self, emotion: str) -> str:
         """Return color code for emotion (for UI)"""
-        color_map = {
-            "sad": "#6B8E23",
-            "anxious": "#FF8C00",
-            "angry": "#DC143C",
-            "happy": "#32CD32",
-            "fearful": "#9370DB",
-            "confused": "#4682B4",
-            "neutral": "#808080"
-        }
-        return color_map.get(emotion, "#808080")
+        return EMOTION_COLORS.get(emotion, "#808080")
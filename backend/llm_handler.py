@@ -1,13 +1,213 @@
+import asyncio
+import hashlib
 import os
+import random
+import re
 import requests
+import threading
 import time
-from typing import Dict, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, Optional
 
 try:
-    from huggingface_hub import InferenceClient
+    from huggingface_hub import InferenceClient, InferenceTimeoutError
+    from huggingface_hub.utils import HfHubHTTPError
     HAS_HF_CLIENT = True
 except ImportError:
     HAS_HF_CLIENT = False
+    InferenceTimeoutError = HfHubHTTPError = ()
+
+try:
+    from huggingface_hub import AsyncInferenceClient
+    HAS_ASYNC_HF_CLIENT = True
+except ImportError:
+    HAS_ASYNC_HF_CLIENT = False
+
+def _pooled_session() -> requests.Session:
+    """requests session with a keep-alive pool sized for several concurrent chats"""
+    session = requests.Session()
+    # Retries are handled (with backoff) in LLMHandler.generate_response
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def configure_http_pool() -> bool:
+    """
+    Send huggingface_hub requests through the _pooled_session keep-alive pool
+    
+    This replaces the HTTP backend for the whole process, so the app calls it
+    once at start-up; importing this module changes nothing. huggingface_hub
+    1.0+ uses a shared httpx client that already keeps connections alive, and
+    there this returns False.
+    """
+    try:
+        from huggingface_hub import configure_http_backend
+    except ImportError:
+        return False
+    configure_http_backend(backend_factory=_pooled_session)
+    return True
+
+# Newer huggingface_hub releases talk HTTP through httpx instead of requests
+try:
+    import httpx
+    HTTPX_TRANSPORT_ERRORS = (httpx.TransportError,)
+except ImportError:
+    HTTPX_TRANSPORT_ERRORS = ()
+
+# Stop generating once the model starts writing the next turn
+STOP_SEQUENCES = ["\n\nUser:", "</s>"]
+
+# Everything up to and including the last sentence terminator
+_COMPLETE_SENTENCES = re.compile(r".*[.!?]", re.DOTALL)
+
+# Emotion-based supportive messages used when the API is unavailable
+FALLBACK_RESPONSES = {
+    "sad": (
+        "I hear you, and it's completely okay to feel this way right now.",
+        "These difficult emotions are temporary, even though they feel heavy.",
+        "You're stronger than you realize. Let's take this one moment at a time.",
+        "What you're feeling is valid. Would it help to talk about what's troubling you?",
+        "Sometimes we all need support. I'm here to listen without judgment."
+    ),
+    "anxious": (
+        "Anxiety can feel overwhelming, but remember: you've handled difficult moments before.",
+        "Try this: breathe in for 4 counts, hold for 4, breathe out for 6. Let's slow things down.",
+        "What's one small thing you could control right now? Sometimes focusing helps.",
+        "Your worries are real, but not everything you worry about will happen.",
+        "Grounding yourself might help. What's one thing you can see, hear, or feel right now?"
+    ),
+    "angry": (
+        "Your anger is valid. Strong feelings mean something matters to you.",
+        "Before acting on this feeling, pause. What do you really need right now?",
+        "It's okay to be frustrated. Let's explore what's really bothering you.",
+        "Anger often masks another emotion. Can you dig deeper into what you're feeling?",
+        "Taking a break might help. What usually calms you down?"
+    ),
+    "happy": (
+        "That's wonderful! I'm genuinely glad you're experiencing these positive feelings.",
+        "This is beautiful to hear. What's making you feel so good right now?",
+        "Let's celebrate this moment with you! What's contributing most?",
+        "Savor this feeling! These good moments are important and worth recognizing.",
+        "Your joy is contagious. Keep embracing these positive moments!"
+    ),
+    "neutral": (
+        "I'm here and listening. What's on your mind today?",
+        "How are you truly feeling beneath the surface?",
+        "I'm interested in what you have to share. What brings you here?",
+        "Take your time. I'm ready to listen to whatever you want to express.",
+        "Tell me more. What would be most helpful to talk about right now?"
+    ),
+    "fearful": (
+        "Fear is natural, but you're safe right now in this moment.",
+        "What you're afraid of feels real, and that's okay. Let's face it together.",
+        "You're braver than you believe. What specifically is scaring you?",
+        "Fear often shrinks when we talk about it. I'm here to listen.",
+        "Remember: you've overcome challenges before. This is just one more."
+    )
+}
+
+# Extra sentence appended to a fallback reply when the message touches a topic.
+# Checked in order; \b only at the start so "tiredness" or "worrying" still match.
+CONTEXT_ADDITIONS = tuple(
+    (re.compile(r"\b(?:" + keywords + ")", re.IGNORECASE), addition)
+    for keywords, addition in (
+        ("sleep|tired|exhausted", " Getting quality sleep could really help you right now."),
+        ("work|job|boss|colleague", " Work stress is real. Remember, you deserve breaks and boundaries."),
+        ("relationship|friend|family|love", " Relationships matter. Communication is often the first step."),
+        ("health|sick|pain|hurt", " Your wellbeing is important. Take care of yourself first."),
+        ("money|financial|broke|debt", " Financial stress is significant. But you have more control than you think."),
+        ("future|tomorrow|worry|what if", " Focus on today. Tomorrow will take care of itself."),
+    )
+)
+
+class _ResponseCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds"""
+    
+    def __init__(self, maxsize: int = 512, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: bytes, value: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Tokenizers by model; None once loading has failed. Loaded in the background so
+# a download never holds up a reply (token counts are estimated meanwhile).
+_tokenizers = {}
+_tokenizers_loading = set()
+_tokenizer_lock = threading.Lock()
+
+def _get_tokenizer(model: str, token: Optional[str] = None):
+    """Model tokenizer if it has been loaded, else None (and start loading it)"""
+    with _tokenizer_lock:
+        if model in _tokenizers:
+            return _tokenizers[model]
+        if model in _tokenizers_loading:
+            return None
+        _tokenizers_loading.add(model)
+    
+    threading.Thread(target=_load_tokenizer, args=(model, token),
+                     name="tokenizer-loader", daemon=True).start()
+    return None
+
+def _load_tokenizer(model: str, token: Optional[str] = None):
+    """Load a tokenizer (local cache first, then the Hub) into _tokenizers"""
+    tokenizer = None
+    try:
+        from transformers import AutoTokenizer
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(model, token=token, local_files_only=True)
+        except OSError:
+            tokenizer = AutoTokenizer.from_pretrained(model, token=token)
+    except Exception as e:
+        print(f"Tokenizer unavailable for {model}, estimating tokens: {e}")
+    
+    with _tokenizer_lock:
+        _tokenizers[model] = tokenizer
+        _tokenizers_loading.discard(model)
+
+@lru_cache(maxsize=1)
+def _load_local_llm(model: str):
+    """vLLM engine for a small local model (shared by all handlers), or None if it can't start"""
+    try:
+        from vllm import LLM, SamplingParams
+        # Quantization (AWQ/GPTQ) is picked up from the checkpoint's config
+        engine = LLM(model=model, gpu_memory_utilization=0.4, max_model_len=2048)
+        return engine, SamplingParams
+    except Exception as e:
+        print(f"Local model {model} unavailable, using canned responses: {e}")
+        return None
+
+# Opt-in offline model, e.g. LOCAL_LLM_MODEL=TheBloke/TinyLlama-1.1B-Chat-v1.0-AWQ
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL")
+_local_llm_lock = threading.Lock()  # so concurrent sessions don't boot it twice
+
+# Shared by all handlers: identical prompts get identical answers across sessions
+_response_cache = _ResponseCache(maxsize=512, ttl=3600)
 
 class LLMHandler:
     """
@@ -16,12 +216,17 @@ class LLMHandler:
     Fallback: Local response generation
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 timeout: float = 20,
+                 max_retries: int = 3):
         self.api_key = api_key or os.getenv("HUGGINGFACE_API_KEY")
+        self.timeout = timeout
+        self.max_retries = max_retries
         
         # Try to use Hugging Face InferenceClient if available
         if HAS_HF_CLIENT and self.api_key:
-            self.client = InferenceClient(api_key=self.api_key)
+            self.client = InferenceClient(api_key=self.api_key, timeout=self.timeout)
             self.use_client = True
         else:
             self.client = None
@@ -54,28 +259,186 @@ class LLMHandler:
         """
         
         if not self.api_key or not self.use_client:
-            return self._fallback_response(emotion, prompt)
+            return self._offline_response(prompt, emotion, max_length, temperature)
         
-        try:
-            # Use InferenceClient for text generation
-            response_text = self.client.text_generation(
-                prompt=prompt,
-                model=self.current_model,
-                max_new_tokens=150,
-                temperature=0.7,
-                top_p=0.9,
-            )
-            
-            if response_text:
-                return self._clean_response(response_text)
+        cache_key = self._cache_key(prompt, max_length, temperature)
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        for attempt in range(self.max_retries):
+            try:
+                # Use InferenceClient for text generation
+                response_text = self.client.text_generation(
+                    **self._generation_kwargs(prompt, max_length, temperature)
+                )
                 
-            return self._fallback_response(emotion, prompt)
-            
+                if response_text:
+                    response_text = self._clean_response(response_text)
+                    _response_cache.set(cache_key, response_text)
+                    return response_text
+                
+                return self._offline_response(prompt, emotion, max_length, temperature)
+                
+            except Exception as e:
+                print(f"LLM API Error (attempt {attempt + 1}/{self.max_retries}): {str(e)}")
+                if not self._is_retryable(e) or attempt == self.max_retries - 1:
+                    break
+                
+                # Exponential backoff: 1s, 2s, 4s...
+                time.sleep(2 ** attempt)
+        
+        return self._offline_response(prompt, emotion, max_length, temperature)
+    
+    def stream_response(self,
+                        prompt: str,
+                        emotion: str = "neutral",
+                        max_length: int = 150,
+                        temperature: float = 0.7) -> Iterator[str]:
+        """
+        Yield the response in chunks as the model generates it
+        
+        Connection failures before the first token are retried like in
+        generate_response; without the API (or if nothing arrives) the
+        fallback response is yielded as a single chunk.
+        """
+        
+        if not self.api_key or not self.use_client:
+            yield self._offline_response(prompt, emotion, max_length, temperature)
+            return
+        
+        cache_key = self._cache_key(prompt, max_length, temperature)
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        pieces = []
+        completed = False
+        for attempt in range(self.max_retries):
+            try:
+                for token in self.client.text_generation(
+                    stream=True, **self._generation_kwargs(prompt, max_length, temperature)
+                ):
+                    pieces.append(token)
+                    yield token
+                completed = True
+                break
+                
+            except Exception as e:
+                print(f"LLM API Error (attempt {attempt + 1}/{self.max_retries}): {str(e)}")
+                # Text already shown can't be taken back, so only retry before it starts
+                if pieces or not self._is_retryable(e) or attempt == self.max_retries - 1:
+                    break
+                
+                time.sleep(2 ** attempt)
+        
+        if not pieces:
+            yield self._offline_response(prompt, emotion, max_length, temperature)
+            return
+        
+        # A reply cut off by a dropped connection must not be served again
+        if completed:
+            _response_cache.set(cache_key, self._clean_response("".join(pieces)))
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Number of tokens text uses for the current model
+        
+        Uses the model tokenizer when the API is in use and the tokenizer has
+        finished loading; otherwise estimates ~4 characters per token.
+        """
+        tokenizer = _get_tokenizer(self.current_model, self.api_key) if self.use_client else None
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False))
+        return len(text) // 4 + 1
+    
+    async def agenerate_response(self,
+                                 prompt: str,
+                                 emotion: str = "neutral",
+                                 max_length: int = 150,
+                                 temperature: float = 0.7) -> str:
+        """
+        Async version of generate_response
+        
+        Awaits the HTTP call with AsyncInferenceClient so an event loop can serve
+        other requests meanwhile. Same retry and fallback behaviour.
+        """
+        
+        if not self.api_key or not self.use_client:
+            return await asyncio.to_thread(
+                self._offline_response, prompt, emotion, max_length, temperature
+            )
+        
+        if not HAS_ASYNC_HF_CLIENT:
+            return await asyncio.to_thread(
+                self.generate_response, prompt, emotion, max_length, temperature
+            )
+        
+        cache_key = self._cache_key(prompt, max_length, temperature)
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        response_text = None
+        try:
+            # A fresh client per call: its HTTP session is bound to the running loop
+            async with AsyncInferenceClient(api_key=self.api_key, timeout=self.timeout) as client:
+                for attempt in range(self.max_retries):
+                    try:
+                        response_text = await client.text_generation(
+                            **self._generation_kwargs(prompt, max_length, temperature)
+                        )
+                        break
+                        
+                    except Exception as e:
+                        print(f"LLM API Error (attempt {attempt + 1}/{self.max_retries}): {str(e)}")
+                        if not self._is_retryable(e) or attempt == self.max_retries - 1:
+                            break
+                        
+                        await asyncio.sleep(2 ** attempt)
+        
         except Exception as e:
-            print(f"LLM API Error: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return self._fallback_response(emotion, prompt)
+            # Setting up or closing the client's HTTP session failed
+            print(f"LLM API client error: {str(e)}")
+        
+        if response_text:
+            response_text = self._clean_response(response_text)
+            _response_cache.set(cache_key, response_text)
+            return response_text
+        
+        return await asyncio.to_thread(
+            self._offline_response, prompt, emotion, max_length, temperature
+        )
+    
+    def _cache_key(self, prompt: str, max_length: int, temperature: float) -> bytes:
+        """Digest of everything that shapes a generation (temperature in 0.1 steps)"""
+        raw = f"{self.current_model}|{max_length}|{round(temperature, 1)}|{prompt}"
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+    
+    def _generation_kwargs(self, prompt: str, max_length: int, temperature: float) -> Dict:
+        """Arguments for text_generation shared by the sync and async clients"""
+        return {
+            "prompt": prompt,
+            "model": self.current_model,
+            "max_new_tokens": max_length,
+            "temperature": temperature,
+            "top_p": 0.9,
+            "stop": STOP_SEQUENCES,
+        }
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        """Timeouts, connection drops, throttling and server errors are worth retrying"""
+        if isinstance(error, (InferenceTimeoutError, TimeoutError,
+                              requests.exceptions.Timeout, requests.exceptions.ConnectionError)
+                      + HTTPX_TRANSPORT_ERRORS):
+            return True
+        
+        if isinstance(error, (HfHubHTTPError, requests.exceptions.HTTPError)):
+            status = getattr(getattr(error, "response", None), "status_code", None)
+            return status is None or status == 429 or status >= 500
+        
+        return False
     
     def _clean_response(self, text: str) -> str:
         """Clean and format the generated response"""
@@ -83,87 +446,43 @@ class LLMHandler:
         
         # Remove incomplete sentences at the end
         if text and text[-1] not in '.!?':
-            last_punct = max(
-                text.rfind('.'),
-                text.rfind('!'),
-                text.rfind('?')
-            )
-            if last_punct > 0:
-                text = text[:last_punct + 1]
+            match = _COMPLETE_SENTENCES.match(text)
+            if match and match.end() > 1:
+                text = match.group()
         
         return text
     
+    def _offline_response(self, prompt: str, emotion: str, max_length: int, temperature: float) -> str:
+        """Reply from the local model if one is configured, else a canned fallback"""
+        local = None
+        if LOCAL_LLM_MODEL:
+            with _local_llm_lock:
+                local = _load_local_llm(LOCAL_LLM_MODEL)
+        if local is not None:
+            engine, SamplingParams = local
+            try:
+                params = SamplingParams(temperature=temperature, top_p=0.9,
+                                        max_tokens=max_length, stop=STOP_SEQUENCES)
+                text = engine.generate([prompt], params, use_tqdm=False)[0].outputs[0].text
+                if text.strip():
+                    return self._clean_response(text)
+            except Exception as e:
+                print(f"Local model error: {str(e)}")
+        
+        return self._fallback_response(emotion, prompt)
+    
     def _fallback_response(self, emotion: str, user_message: str = "") -> str:
         """
         Enhanced fallback responses when API is unavailable
         Emotion-based supportive messages with keyword matching
         """
-        # Advanced fallback responses based on emotion
-        fallback_responses = {
-            "sad": [
-                "I hear you, and it's completely okay to feel this way right now.",
-                "These difficult emotions are temporary, even though they feel heavy.",
-                "You're stronger than you realize. Let's take this one moment at a time.",
-                "What you're feeling is valid. Would it help to talk about what's troubling you?",
-                "Sometimes we all need support. I'm here to listen without judgment."
-            ],
-            "anxious": [
-                "Anxiety can feel overwhelming, but remember: you've handled difficult moments before.",
-                "Try this: breathe in for 4 counts, hold for 4, breathe out for 6. Let's slow things down.",
-                "What's one small thing you could control right now? Sometimes focusing helps.",
-                "Your worries are real, but not everything you worry about will happen.",
-                "Grounding yourself might help. What's one thing you can see, hear, or feel right now?"
-            ],
-            "angry": [
-                "Your anger is valid. Strong feelings mean something matters to you.",
-                "Before acting on this feeling, pause. What do you really need right now?",
-                "It's okay to be frustrated. Let's explore what's really bothering you.",
-                "Anger often masks another emotion. Can you dig deeper into what you're feeling?",
-                "Taking a break might help. What usually calms you down?"
-            ],
-            "happy": [
-                "That's wonderful! I'm genuinely glad you're experiencing these positive feelings.",
-                "This is beautiful to hear. What's making you feel so good right now?",
-                "Let's celebrate this moment with you! What's contributing most?",
-                "Savor this feeling! These good moments are important and worth recognizing.",
-                "Your joy is contagious. Keep embracing these positive moments!"
-            ],
-            "neutral": [
-                "I'm here and listening. What's on your mind today?",
-                "How are you truly feeling beneath the surface?",
-                "I'm interested in what you have to share. What brings you here?",
-                "Take your time. I'm ready to listen to whatever you want to express.",
-                "Tell me more. What would be most helpful to talk about right now?"
-            ],
-            "fearful": [
-                "Fear is natural, but you're safe right now in this moment.",
-                "What you're afraid of feels real, and that's okay. Let's face it together.",
-                "You're braver than you believe. What specifically is scaring you?",
-                "Fear often shrinks when we talk about it. I'm here to listen.",
-                "Remember: you've overcome challenges before. This is just one more."
-            ]
-        }
-        
-        import random
-        
         # Get responses for this emotion
-        responses = fallback_responses.get(emotion, fallback_responses["neutral"])
+        responses = FALLBACK_RESPONSES.get(emotion, FALLBACK_RESPONSES["neutral"])
         base_response = random.choice(responses)
         
         # Add contextual elements if message contains keywords
-        context_additions = {
-            "sleep|tired|exhausted": " Getting quality sleep could really help you right now.",
-            "work|job|boss|colleague": " Work stress is real. Remember, you deserve breaks and boundaries.",
-            "relationship|friend|family|love": " Relationships matter. Communication is often the first step.",
-            "health|sick|pain|hurt": " Your wellbeing is important. Take care of yourself first.",
-            "money|financial|broke|debt": " Financial stress is significant. But you have more control than you think.",
-            "future|tomorrow|worry|what if": " Focus on today. Tomorrow will take care of itself."
-        }
-        
-        # Check if any keywords match
-        user_message_lower = user_message.lower()
-        for keywords, addition in context_additions.items():
-            if any(keyword in user_message_lower for keyword in keywords.split("|")):
+        for pattern, addition in CONTEXT_ADDITIONS:
+            if pattern.search(user_message):
                 base_response = base_response.rstrip(".!?") + "." + addition
                 break
         
@@ -1,40 +1,120 @@
+import numpy as np
 import pandas as pd
+import logging
 import os
+import sqlite3
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 import json
 
+logger = logging.getLogger(__name__)
+
+# Serializes access to the shared SQLite connection across Streamlit sessions
+_db_lock = threading.Lock()
+
 class MoodTracker:
     """
-    Tracks user mood over time using CSV storage
+    Tracks user mood over time using SQLite storage
     Provides analytics and visualizations
     """
     
+    COLUMNS = (
+        "timestamp",
+        "date",
+        "time",
+        "emotion",
+        "confidence",
+        "sentiment",
+        "intensity",
+        "message_preview",
+        "session_id"
+    )
+    
+    # Columns the statistics/trend computations actually read
+    _STATS_COLUMNS = ("timestamp", "date", "time", "emotion", "confidence", "sentiment", "intensity")
+    
+    # Dashboard also shows the message preview of recent entries
+    _DASHBOARD_COLUMNS = _STATS_COLUMNS + ("message_preview",)
+    
+    # Rows are stored with an extra epoch-seconds column used for range filters
+    _INSERT_SQL = (
+        f"INSERT INTO mood_logs ({', '.join(COLUMNS)}, timestamp_epoch) "
+        f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})"
+    )
+    
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        self.mood_file = os.path.join(data_dir, "mood_logs.csv")
+        self.db_file = os.path.join(data_dir, "mood_logs.db")
+        self.legacy_csv = os.path.join(data_dir, "mood_logs.csv")
         
         # Create data directory if it doesn't exist
         os.makedirs(data_dir, exist_ok=True)
         
-        # Initialize CSV if it doesn't exist
-        if not os.path.exists(self.mood_file):
-            self._create_mood_file()
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._create_tables()
+        
+        # Memoized statistics/trends, invalidated whenever the log changes
+        self._version = 0
+        self._cache = {}
+        
+        # Carry over entries from the old CSV log, once
+        if os.path.exists(self.legacy_csv):
+            self._import_legacy_csv()
+    
+    def _create_tables(self):
+        """Create the mood log table and its indexes"""
+        with _db_lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS mood_logs (
+                    timestamp TEXT NOT NULL,
+                    date TEXT,
+                    time TEXT,
+                    emotion TEXT,
+                    confidence REAL,
+                    sentiment TEXT,
+                    intensity TEXT,
+                    message_preview TEXT,
+                    session_id TEXT,
+                    timestamp_epoch INTEGER
+                )
+            """)
+            
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mood_logs_epoch ON mood_logs(timestamp_epoch)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_mood_logs_session ON mood_logs(session_id)")
     
-    def _create_mood_file(self):
-        """Create initial mood log CSV"""
-        df = pd.DataFrame(columns=[
-            "timestamp",
-            "date",
-            "time",
-            "emotion",
-            "confidence",
-            "sentiment",
-            "intensity",
-            "message_preview",
-            "session_id"
-        ])
-        df.to_csv(self.mood_file, index=False)
+    def _import_legacy_csv(self):
+        """
+        Move rows from mood_logs.csv into the database and set the CSV aside
+        
+        Runs under the database lock so sessions starting together import it once.
+        A CSV that can't be imported is renamed to .failed rather than retried.
+        """
+        with _db_lock:
+            if not os.path.exists(self.legacy_csv):
+                return  # another session got here first
+            
+            try:
+                df = pd.read_csv(self.legacy_csv)
+                if not df.empty:
+                    df = df.reindex(columns=list(self.COLUMNS))
+                    # Normalize to isoformat and derive the epoch column
+                    parsed = pd.to_datetime(df['timestamp'], format='ISO8601')
+                    df['timestamp'] = parsed.map(lambda ts: ts.isoformat())
+                    df['timestamp_epoch'] = parsed.map(lambda ts: int(ts.to_pydatetime().timestamp()))
+                    df['message_preview'] = df['message_preview'].fillna("")
+                    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+                    with self.conn:
+                        self.conn.executemany(self._INSERT_SQL, rows)
+                suffix = ".imported"
+            except Exception as e:
+                logger.error("Error importing legacy mood log %s: %s", self.legacy_csv, e)
+                suffix = ".failed"
+            
+            try:
+                os.replace(self.legacy_csv, self.legacy_csv + suffix)
+            except OSError as e:
+                logger.error("Could not set aside legacy mood log %s: %s", self.legacy_csv, e)
     
     def log_mood(self, 
                  emotion: str,
@@ -61,23 +141,23 @@ class MoodTracker:
         try:
             now = datetime.now()
             
-            # Create new entry
-            new_entry = {
-                "timestamp": now.isoformat(),
-                "date": now.strftime("%Y-%m-%d"),
-                "time": now.strftime("%H:%M:%S"),
-                "emotion": emotion,
-                "confidence": confidence,
-                "sentiment": sentiment,
-                "intensity": intensity,
-                "message_preview": message[:100] if message else "",
-                "session_id": session_id
-            }
+            # Create new entry (same order as COLUMNS, then the epoch)
+            new_entry = (
+                now.isoformat(),
+                now.strftime("%Y-%m-%d"),
+                now.strftime("%H:%M:%S"),
+                emotion,
+                confidence,
+                sentiment,
+                intensity,
+                message[:100] if message else "",
+                session_id,
+                int(now.timestamp())
+            )
             
-            # Append to CSV
-            df = pd.read_csv(self.mood_file)
-            df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-            df.to_csv(self.mood_file, index=False)
+            with _db_lock, self.conn:
+                self.conn.execute(self._INSERT_SQL, new_entry)
+            self._version += 1
             
             return True
             
@@ -85,32 +165,56 @@ class MoodTracker:
             print(f"Error logging mood: {e}")
             return False
     
-    def get_recent_moods(self, days: int = 7, limit: int = 50) -> pd.DataFrame:
-        """Get recent mood entries"""
+    def get_recent_moods(self,
+                         days: int = 7,
+                         limit: int = 50,
+                         columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Get recent mood entries, newest first
+        
+        Optionally only the given columns (timestamp is always read). Timestamps
+        are returned as the stored ISO 8601 strings.
+        """
         
         try:
-            df = pd.read_csv(self.mood_file)
-            
-            if df.empty:
-                return df
-            
-            # Convert timestamp to datetime
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            # Filter by date range
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['timestamp'] >= cutoff_date]
-            
-            # Sort by timestamp descending
-            df = df.sort_values('timestamp', ascending=False)
-            
-            # Limit results
-            return df.head(limit)
+            query, params = self._recent_query(days, limit, columns)
+            with _db_lock:
+                return pd.read_sql_query(query, self.conn, params=params)
             
         except Exception as e:
             print(f"Error retrieving moods: {e}")
             return pd.DataFrame()
     
+    def get_recent_moods_as_rows(self, days: int = 7, limit: int = 50) -> List[Dict[str, any]]:
+        """Like get_recent_moods, but plain row dicts (no DataFrame), for streaming exports"""
+        
+        try:
+            query, params = self._recent_query(days, limit)
+            with _db_lock:
+                cursor = self.conn.execute(query, params)
+                names = [column[0] for column in cursor.description]
+                return [dict(zip(names, row)) for row in cursor]
+            
+        except Exception as e:
+            print(f"Error retrieving moods: {e}")
+            return []
+    
+    def _recent_query(self, days: int, limit: int, columns: Optional[Sequence[str]] = None):
+        """SQL and parameters selecting the newest entries of the last `days` days"""
+        if columns is None:
+            selected = self.COLUMNS
+        else:
+            # Keep table order and only known column names
+            selected = [column for column in self.COLUMNS
+                        if column in columns or column == "timestamp"]
+        
+        cutoff = int((datetime.now() - timedelta(days=days)).timestamp())
+        query = (
+            f"SELECT {', '.join(selected)} FROM mood_logs "
+            "WHERE timestamp_epoch >= ? ORDER BY timestamp_epoch DESC, rowid DESC LIMIT ?"
+        )
+        return query, (cutoff, limit)
+    
     def get_mood_statistics(self, days: int = 7) -> Dict[str, any]:
         """
         Calculate mood statistics for a time period
@@ -119,7 +223,36 @@ class MoodTracker:
             Dict with statistics and insights
         """
         
-        df = self.get_recent_moods(days=days, limit=1000)
+        return self._cached("statistics", days, self._compute_statistics)
+    
+    def _cached(self, kind: str, days: int, compute) -> Dict[str, any]:
+        """
+        Return compute(recent entries) from cache while the log is unchanged
+        
+        The key covers writes through this tracker (_version), writes from other
+        connections (PRAGMA data_version) and the current day, since the window moves.
+        """
+        
+        try:
+            with _db_lock:
+                data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        except Exception:
+            data_version = None
+        
+        key = (kind, days, self._version, data_version, datetime.now().date())
+        if data_version is not None and key in self._cache:
+            return self._cache[key]
+        
+        df = self.get_recent_moods(days=days, limit=1000, columns=self._STATS_COLUMNS)
+        result = compute(df)
+        
+        # Only the latest version is ever looked up again
+        self._cache = {k: v for k, v in self._cache.items() if k[2:] == key[2:]}
+        self._cache[key] = result
+        return result
+    
+    def _compute_statistics(self, df: pd.DataFrame) -> Dict[str, any]:
+        """Calculate mood statistics from already-filtered mood entries"""
         
         if df.empty:
             return {
@@ -140,8 +273,8 @@ class MoodTracker:
             "emotion_distribution": df['emotion'].value_counts().to_dict(),
             "intensity_distribution": df['intensity'].value_counts().to_dict(),
             "date_range": {
-                "start": df['timestamp'].min().strftime("%Y-%m-%d"),
-                "end": df['timestamp'].max().strftime("%Y-%m-%d")
+                "start": df['date'].min(),
+                "end": df['date'].max()
             }
         }
         
@@ -155,14 +288,17 @@ class MoodTracker:
             Dict with trend analysis
         """
         
-        df = self.get_recent_moods(days=days, limit=1000)
+        return self._cached("trends", days, self._compute_trends)
+    
+    def _compute_trends(self, df: pd.DataFrame) -> Dict[str, any]:
+        """Analyze mood trends from already-filtered mood entries"""
         
         if df.empty:
             return {"trend": "insufficient_data", "insights": []}
         
         # Group by date
-        daily_moods = df.groupby('date')['emotion'].agg(lambda x: x.mode()[0] if not x.empty else 'neutral')
-        daily_sentiment = df.groupby('date')['sentiment'].agg(lambda x: x.mode()[0] if not x.empty else 'neutral')
+        daily_moods = self._daily_mode(df, 'emotion')
+        daily_sentiment = self._daily_mode(df, 'sentiment')
         
         # Calculate trend
         positive_days = sum(1 for s in daily_sentiment if s == 'positive')
@@ -188,6 +324,11 @@ class MoodTracker:
             "insights": insights
         }
     
+    def _daily_mode(self, df: pd.DataFrame, column: str) -> pd.Series:
+        """Most frequent value of column per date (ties go to the first label, like mode())"""
+        counts = df.groupby(['date', column]).size().unstack(fill_value=0)
+        return counts.idxmax(axis=1)
+    
     def _generate_insights(self, df: pd.DataFrame) -> List[str]:
         """Generate personalized insights from mood data"""
         
@@ -198,14 +339,21 @@ class MoodTracker:
         if most_common:
             insights.append(f"You've been feeling {most_common} most often lately.")
         
-        # Time patterns
-        df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
-        morning = df[df['hour'] < 12]
-        evening = df[df['hour'] >= 18]
+        # Time patterns: one bincount of (period, sentiment) pairs
+        # Periods: 0 = morning (<12h), 1 = evening (>=18h), 2 = other/unknown
+        hours = pd.to_numeric(df['time'].astype("string").str[:2], errors='coerce').to_numpy()
+        period = np.where(hours < 12, 0, np.where(hours >= 18, 1, 2))
+        has_sentiment = df['sentiment'].notna().to_numpy()
+        # np.unique sorts labels, so argmax ties resolve alphabetically like mode()
+        labels, codes = np.unique(df['sentiment'].to_numpy()[has_sentiment].astype(str), return_inverse=True)
+        counts = np.bincount(
+            period[has_sentiment] * len(labels) + codes,
+            minlength=3 * len(labels)
+        ).reshape(3, len(labels))
         
-        if not morning.empty and not evening.empty:
-            morning_sentiment = morning['sentiment'].mode()[0]
-            evening_sentiment = evening['sentiment'].mode()[0]
+        if len(labels) and counts[0].sum() and counts[1].sum():
+            morning_sentiment = labels[counts[0].argmax()]
+            evening_sentiment = labels[counts[1].argmax()]
             
             if morning_sentiment == 'positive' and evening_sentiment == 'negative':
                 insights.append("You tend to feel better in the morning.")
@@ -213,12 +361,32 @@ class MoodTracker:
                 insights.append("Your mood improves as the day goes on.")
         
         # Intensity patterns
-        high_intensity = len(df[df['intensity'] == 'high'])
+        high_intensity = np.count_nonzero(df['intensity'].to_numpy() == 'high')
         if high_intensity > len(df) * 0.5:
             insights.append("You've been experiencing strong emotions. Remember to take breaks.")
         
         return insights
     
+    def get_dashboard_bundle(self,
+                             days: int = 30,
+                             limit: int = 20,
+                             columns: Optional[Sequence[str]] = None) -> Dict[str, any]:
+        """
+        Collect everything the mood dashboard (or an export) needs from a single read
+        
+        Returns:
+            Dict with 'stats', 'trends' and 'recent' (latest `limit` entries,
+            dashboard columns unless `columns` is given)
+        """
+        
+        df = self.get_recent_moods(days=days, limit=1000, columns=columns or self._DASHBOARD_COLUMNS)
+        
+        return {
+            "stats": self._compute_statistics(df),
+            "trends": self._compute_trends(df),
+            "recent": df.head(limit)
+        }
+    
     def export_mood_data(self, format: str = "json") -> Optional[str]:
         """Export mood data in various formats"""
         
@@ -242,13 +410,11 @@ class MoodTracker:
         """Delete mood logs older than specified days"""
         
         try:
-            df = pd.read_csv(self.mood_file)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            
-            cutoff_date = datetime.now() - timedelta(days=days)
-            df = df[df['timestamp'] >= cutoff_date]
+            cutoff = int((datetime.now() - timedelta(days=days)).timestamp())
+            with _db_lock, self.conn:
+                self.conn.execute("DELETE FROM mood_logs WHERE timestamp_epoch < ?", (cutoff,))
+            self._version += 1
             
-            df.to_csv(self.mood_file, index=False)
             return True
             
         except Exception as e:
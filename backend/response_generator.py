@@ -1,21 +1,58 @@
-from typing import Dict, List, Optional
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
 from backend.llm_handler import LLMHandler
 from backend.emotion_detector import EmotionDetector
 from backend.safety_filter import SafetyFilter
 from utils.prompts import PromptBuilder
 
+# Quick-response buttons offered after each emotion
+SUGGESTIONS = {
+    "sad": (
+        "Tell me more about what's bothering you",
+        "What usually helps when you feel this way?",
+        "I'm here to listen"
+    ),
+    "anxious": (
+        "Let's try a breathing exercise",
+        "What's making you feel anxious?",
+        "How can I support you right now?"
+    ),
+    "angry": (
+        "Tell me what happened",
+        "What triggered these feelings?",
+        "Take your time to express yourself"
+    ),
+    "happy": (
+        "That's wonderful! Tell me more",
+        "What made your day better?",
+        "I'm glad to hear that!"
+    ),
+    "neutral": (
+        "How are you feeling today?",
+        "What's on your mind?",
+        "Tell me about your day"
+    )
+}
+
 class ResponseGenerator:
     """
     Main controller for generating safe, supportive responses
     Coordinates all backend components
     """
     
+    # Sentence boundary while streaming; the whitespace is captured so it can be re-emitted
+    _SENTENCE_BREAK = re.compile(r"(?<=[.!?])(\s+)")
+    
     def __init__(self, api_key: Optional[str] = None):
         self.llm = LLMHandler(api_key)
         self.emotion_detector = EmotionDetector()
         self.safety_filter = SafetyFilter()
         self.prompt_builder = PromptBuilder()
         self.conversation_history = []
+        
+        # Emotions of the user messages currently in conversation_history
+        self._emotion_counter = Counter()
     
     def generate(self, 
                  user_message: str,
@@ -31,6 +68,141 @@ class ResponseGenerator:
             Dict containing response, emotion data, and metadata
         """
         
+        prepared = self._prepare(user_message, conversation_context)
+        if "response" in prepared:
+            return prepared
+        
+        # Step 5: Generate response using LLM
+        raw_response = self.llm.generate_response(
+            prompt=prepared["prompt"],
+            emotion=prepared["emotion_data"]["primary_emotion"]
+        )
+        
+        return self._finalize(user_message, raw_response, prepared)
+    
+    async def agenerate(self,
+                        user_message: str,
+                        conversation_context: Optional[List[Dict]] = None) -> Dict[str, any]:
+        """
+        Async version of generate: the LLM call is awaited instead of blocking
+        
+        The local checks (validation, crisis, emotion) take microseconds and run
+        inline; only the network round trip is worth yielding on.
+        """
+        
+        prepared = self._prepare(user_message, conversation_context)
+        if "response" in prepared:
+            return prepared
+        
+        raw_response = await self.llm.agenerate_response(
+            prompt=prepared["prompt"],
+            emotion=prepared["emotion_data"]["primary_emotion"]
+        )
+        
+        return self._finalize(user_message, raw_response, prepared)
+    
+    def generate_stream(self,
+                        user_message: str,
+                        conversation_context: Optional[List[Dict]] = None) -> Dict[str, any]:
+        """
+        Like generate, but 'response' is an iterator of text chunks (for st.write_stream)
+        
+        The emotion fields are available immediately. The text is released one
+        sentence at a time after the safety filter has checked it. Conversation
+        history, 'is_safe' and 'final_response' (the reply to keep) are set once
+        the iterator is exhausted.
+        """
+        
+        prepared = self._prepare(user_message, conversation_context)
+        if "response" in prepared:
+            prepared["response"] = iter([prepared["response"]])
+            return prepared
+        
+        chunks = self.llm.stream_response(
+            prompt=prepared["prompt"],
+            emotion=prepared["emotion_data"]["primary_emotion"]
+        )
+        
+        response_object = self._create_response_object(
+            response=None,
+            emotion_data=prepared["emotion_data"],
+            is_safe=True,
+            metadata={
+                "model_used": self.llm.current_model,
+                "prompt_length": len(prepared["prompt"]),
+                "streamed": True
+            }
+        )
+        response_object["response"] = self._filter_stream(chunks, user_message, prepared, response_object)
+        return response_object
+    
+    def _filter_stream(self,
+                       chunks: Iterator[str],
+                       user_message: str,
+                       prepared: Dict,
+                       response_object: Dict) -> Iterator[str]:
+        """Release streamed text sentence by sentence through the safety filter"""
+        
+        emitted = []
+        is_safe = True
+        
+        def sentences():
+            """Complete sentences (with the whitespace after them) as they arrive"""
+            buffer = ""
+            for chunk in chunks:
+                buffer += chunk
+                parts = self._SENTENCE_BREAK.split(buffer)
+                buffer = parts.pop()
+                yield from zip(parts[::2], parts[1::2])
+            
+            # Last sentence: keep it if complete (or if it is all there is), like _clean_response
+            remainder = buffer.strip()
+            if remainder and (remainder[-1] in ".!?" or not emitted):
+                yield remainder, ""
+        
+        safe_alternative = None
+        for sentence, separator in sentences():
+            filtered, sentence_safe = self.safety_filter.filter_response(sentence, user_message)
+            if not sentence_safe:
+                # The rest of the reply becomes the safe alternative
+                is_safe = False
+                safe_alternative = filtered
+                yield ("\n\n" if emitted else "") + filtered
+                break
+            text = self.safety_filter.sanitize_output(sentence) + separator
+            emitted.append(text)
+            yield text
+        
+        # Stop the model stream early if the filter cut the reply short
+        if hasattr(chunks, "close"):
+            chunks.close()
+        
+        # Sentences streamed before an unsafe one can't be unsent, but only the
+        # safe alternative is kept as the reply
+        final_response = "".join(emitted).rstrip() if is_safe else safe_alternative
+        
+        # Disclaimer decision is made on the whole reply, as in generate()
+        if is_safe:
+            with_disclaimer, _ = self.safety_filter.filter_response(final_response, user_message)
+            if with_disclaimer != final_response:
+                yield with_disclaimer[len(final_response):]
+                final_response = with_disclaimer
+        
+        response_object["is_safe"] = is_safe
+        response_object["final_response"] = final_response
+        self._update_history(user_message, final_response, prepared["emotion_data"]["primary_emotion"])
+    
+    def _prepare(self,
+                 user_message: str,
+                 conversation_context: Optional[List[Dict]]) -> Dict[str, any]:
+        """
+        Run the checks that happen before the LLM call
+        
+        Returns:
+            A finished response object if the message is handled without the LLM,
+            otherwise a dict with 'emotion_data' and 'prompt'
+        """
+        
         # Step 1: Validate input
         validation = self.safety_filter.validate_user_input(user_message)
         if not validation["valid"]:
@@ -51,21 +223,24 @@ class ResponseGenerator:
                 metadata={"is_crisis": True}
             )
         
-        # Step 3: Detect emotion
-        emotion_data = self.emotion_detector.detect_emotion(user_message)
+        # Step 3: Detect emotion (lowercase the message once and hand it over)
+        emotion_data = self.emotion_detector.detect_emotion(
+            user_message,
+            text_lower=user_message.lower()
+        )
         
         # Step 4: Build context-aware prompt
         prompt = self.prompt_builder.build_prompt(
             user_message=user_message,
             emotion=emotion_data["primary_emotion"],
-            conversation_history=conversation_context or self.conversation_history
+            conversation_history=conversation_context or self.conversation_history,
+            token_counter=self.llm.count_tokens
         )
         
-        # Step 5: Generate response using LLM
-        raw_response = self.llm.generate_response(
-            prompt=prompt,
-            emotion=emotion_data["primary_emotion"]
-        )
+        return {"emotion_data": emotion_data, "prompt": prompt}
+    
+    def _finalize(self, user_message: str, raw_response: str, prepared: Dict) -> Dict[str, any]:
+        """Filter and sanitize the LLM output, record it and build the response object"""
         
         # Step 6: Safety filter
         filtered_response, is_safe = self.safety_filter.filter_response(
@@ -77,16 +252,16 @@ class ResponseGenerator:
         final_response = self.safety_filter.sanitize_output(filtered_response)
         
         # Step 8: Update conversation history
-        self._update_history(user_message, final_response)
+        self._update_history(user_message, final_response, prepared["emotion_data"]["primary_emotion"])
         
         # Step 9: Return complete response object
         return self._create_response_object(
             response=final_response,
-            emotion_data=emotion_data,
+            emotion_data=prepared["emotion_data"],
             is_safe=is_safe,
             metadata={
                 "model_used": self.llm.current_model,
-                "prompt_length": len(prompt)
+                "prompt_length": len(prepared["prompt"])
             }
         )
     
@@ -112,38 +287,39 @@ class ResponseGenerator:
             "metadata": metadata
         }
     
-    def _update_history(self, user_msg: str, bot_msg: str, max_history: int = 10):
-        """Update conversation history with size limit"""
+    def _update_history(self, user_msg: str, bot_msg: str, emotion: str = "neutral", max_history: int = 10):
+        """Update conversation history (and the emotion tally) with size limit"""
         self.conversation_history.append({
             "role": "user",
-            "content": user_msg
+            "content": user_msg,
+            "emotion": emotion
         })
         self.conversation_history.append({
             "role": "assistant",
             "content": bot_msg
         })
+        self._emotion_counter[emotion] += 1
         
         # Keep only recent history
         if len(self.conversation_history) > max_history * 2:
+            trimmed = self.conversation_history[:-(max_history * 2)]
             self.conversation_history = self.conversation_history[-(max_history * 2):]
+            for msg in trimmed:
+                if msg["role"] == "user":
+                    self._emotion_counter[msg["emotion"]] -= 1
+            self._emotion_counter = +self._emotion_counter  # drop zero counts
     
     def get_conversation_summary(self) -> Dict[str, any]:
         """Generate summary of conversation"""
         if not self.conversation_history:
             return {"message_count": 0, "dominant_emotion": "neutral"}
         
-        user_messages = [msg["content"] for msg in self.conversation_history if msg["role"] == "user"]
-        
-        # Analyze overall emotional tone
-        emotions = [self.emotion_detector.detect_emotion(msg)["primary_emotion"] 
-                   for msg in user_messages]
-        
-        from collections import Counter
-        emotion_counts = Counter(emotions)
-        dominant_emotion = emotion_counts.most_common(1)[0][0] if emotions else "neutral"
+        # Emotions were recorded as each message was handled
+        emotion_counts = self._emotion_counter
+        dominant_emotion = emotion_counts.most_common(1)[0][0] if emotion_counts else "neutral"
         
         return {
-            "message_count": len(user_messages),
+            "message_count": sum(emotion_counts.values()),
             "dominant_emotion": dominant_emotion,
             "emotion_distribution": dict(emotion_counts)
         }
@@ -151,35 +327,8 @@ class ResponseGenerator:
     def reset_conversation(self):
         """Clear conversation history"""
         self.conversation_history = []
+        self._emotion_counter = Counter()
     
-    def get_suggestions(self, emotion: str) -> List[str]:
+    def get_suggestions(self, emotion: str) -> Tuple[str, ...]:
         """Get quick response suggestions based on emotion"""
-        suggestions = {
-            "sad": [
-                "Tell me more about what's bothering you",
-                "What usually helps when you feel this way?",
-                "I'm here to listen"
-            ],
-            "anxious": [
-                "Let's try a breathing exercise",
-                "What's making you feel anxious?",
-                "How can I support you right now?"
-            ],
-            "angry": [
-                "Tell me what happened",
-                "What triggered these feelings?",
-                "Take your time to express yourself"
-            ],
-            "happy": [
-                "That's wonderful! Tell me more",
-                "What made your day better?",
-                "I'm glad to hear that!"
-            ],
-            "neutral": [
-                "How are you feeling today?",
-                "What's on your mind?",
-                "Tell me about your day"
-            ]
-        }
-        
-        return suggestions.get(emotion, suggestions["neutral"])
+        return SUGGESTIONS.get(emotion, SUGGESTIONS["neutral"])
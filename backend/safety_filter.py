@@ -1,5 +1,27 @@
 import re
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Tuple
+
+# Contact details stripped from bot output
+_URL_PATTERN = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
+_EMAIL_PATTERN = r'(?a:\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b)'
+_PHONE_PATTERN = r'(?:\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
+
+# All three in one pass; at any position a URL wins over an email over a phone number
+_SANITIZE_RE = re.compile(
+    f"(?P<link>{_URL_PATTERN})|(?P<email>{_EMAIL_PATTERN})|(?P<phone>{_PHONE_PATTERN})"
+)
+_SANITIZE_REPLACEMENTS = {
+    "link": "[link removed]",
+    "email": "[email removed]",
+    "phone": "[phone removed]",
+}
+
+# Every URL contains "http", every email "@" and every phone number a digit
+_DIGIT_RE = re.compile(r'\d')
+
+def _keyword_pattern(keywords: Iterable[str]) -> "re.Pattern":
+    """One compiled, case-insensitive alternation matching any of the keywords as substrings"""
+    return re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE)
 
 class SafetyFilter:
     """
@@ -30,6 +52,18 @@ class SafetyFilter:
             "i diagnose", "you need medication", "take these pills",
             "you should stop taking", "this is definitely"
         ]
+        
+        # Mental health topics that get a disclaimer
+        self.mental_health_terms = [
+            "depression", "anxiety", "mental health", "therapy",
+            "counseling", "psychologist", "psychiatrist"
+        ]
+        
+        # Each list is scanned in a single regex pass instead of one `in` per keyword
+        self._crisis_re = _keyword_pattern(self.crisis_keywords)
+        self._medical_re = _keyword_pattern(self.medical_keywords)
+        self._prohibited_re = _keyword_pattern(self.prohibited_phrases)
+        self._mental_health_re = _keyword_pattern(self.mental_health_terms)
     
     def check_crisis(self, text: str) -> Dict[str, any]:
         """
@@ -39,10 +73,8 @@ class SafetyFilter:
             Dict with is_crisis flag and suggested response
         """
         
-        text_lower = text.lower()
-        
         # Check for crisis keywords
-        crisis_detected = any(keyword in text_lower for keyword in self.crisis_keywords)
+        crisis_detected = self._crisis_re.search(text) is not None
         
         if crisis_detected:
             return {
@@ -79,30 +111,21 @@ You deserve support from trained professionals who can help you through this. I'
             Tuple of (filtered_response, is_safe)
         """
         
-        response_lower = response.lower()
-        
         # Check if response contains medical advice
-        contains_medical = any(keyword in response_lower for keyword in self.medical_keywords)
-        contains_prohibited = any(phrase in response_lower for phrase in self.prohibited_phrases)
-        
-        if contains_medical or contains_prohibited:
+        if self._medical_re.search(response) or self._prohibited_re.search(response):
             # Replace with safe response
             safe_response = self._get_safe_alternative()
             return safe_response, False
         
         # Add disclaimer if discussing mental health
-        if self._is_mental_health_topic(response_lower):
+        if self._is_mental_health_topic(response):
             response = self._add_disclaimer(response)
         
         return response, True
     
     def _is_mental_health_topic(self, text: str) -> bool:
         """Check if response discusses mental health topics"""
-        mental_health_terms = [
-            "depression", "anxiety", "mental health", "therapy",
-            "counseling", "psychologist", "psychiatrist"
-        ]
-        return any(term in text for term in mental_health_terms)
+        return self._mental_health_re.search(text) is not None
     
     def _add_disclaimer(self, response: str) -> str:
         """Add appropriate disclaimer to response"""
@@ -138,7 +161,7 @@ I'm here to listen and provide general emotional support. How are you feeling ri
             }
         
         # Check for spam/gibberish
-        if len(set(text)) < 3 or text.count(text[0]) > len(text) * 0.7:
+        if self._is_gibberish(text):
             return {
                 "valid": False,
                 "reason": "gibberish",
@@ -159,16 +182,25 @@ I'm here to listen and provide general emotional support. How are you feeling ri
             "suggestion": None
         }
     
+    def _is_gibberish(self, text: str) -> bool:
+        """Fewer than 3 distinct characters, or mostly the first character repeated"""
+        if text.count(text[0]) > len(text) * 0.7:
+            return True
+        
+        # Stop as soon as a third distinct character shows up (usually within a few chars)
+        seen = set()
+        for char in text:
+            seen.add(char)
+            if len(seen) >= 3:
+                return False
+        return True
+    
     def sanitize_output(self, text: str) -> str:
         """Remove potentially harmful content from output"""
         
-        # Remove any URLs (to prevent phishing)
-        text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[link removed]', text)
-        
-        # Remove email addresses
-        text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[email removed]', text)
-        
-        # Remove phone numbers
-        text = re.sub(r'(\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}', '[phone removed]', text)
+        # Most replies contain none of these; cheap literal checks skip the regex then
+        if "http" not in text and "@" not in text and _DIGIT_RE.search(text) is None:
+            return text
         
-        return text
+        # Remove URLs (to prevent phishing), email addresses and phone numbers
+        return _SANITIZE_RE.sub(lambda match: _SANITIZE_REPLACEMENTS[match.lastgroup], text)
@@ -0,0 +1,16 @@
+import os
+import sys
+import types
+
+# Tests import the app packages (backend, utils) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# googletrans is an optional runtime dependency; the translator tests replace
+# the Translator with a fake, so a placeholder module is enough to import it
+try:
+    import googletrans  # noqa: F401
+except ImportError:
+    googletrans = types.ModuleType("googletrans")
+    googletrans.Translator = object
+    googletrans.LANGUAGES = {"en": "english", "es": "spanish", "fr": "french", "zh-cn": "chinese (simplified)"}
+    sys.modules["googletrans"] = googletrans
@@ -0,0 +1,111 @@
+import pytest
+
+from backend.emotion_detector import EmotionDetector
+
+TEXTS = [
+    "I'm so happy today, everything went great!",
+    "I feel really anxious about my exam tomorrow",
+    "I am furious with my boss",
+    "ok",
+    "...",
+    "I can't stop crying, I feel so sad and lonely",
+    "Not sure how I feel about the move",
+    "I'm terrified of what might happen",
+]
+
+
+@pytest.fixture(scope="module")
+def detector():
+    return EmotionDetector()
+
+
+def test_batch_matches_single_detection(detector):
+    batch = detector.detect_emotion_batch(TEXTS)
+    
+    assert len(batch) == len(TEXTS)
+    for text, (_, row) in zip(TEXTS, batch.iterrows()):
+        single = detector.detect_emotion(text)
+        assert row["primary_emotion"] == single["primary_emotion"], text
+        assert row["sentiment"] == single["sentiment"], text
+        assert row["intensity"] == single["intensity"], text
+        assert row["confidence"] == pytest.approx(single["confidence"]), text
+
+
+def test_empty_batch(detector):
+    assert detector.detect_emotion_batch([]).empty
+
+
+@pytest.mark.parametrize("text, intensity", [
+    ("I'm happy", "low"),
+    ("I hate this", "low"),
+    ("I feel lonely", "low"),
+    ("I'm excited!!", "medium"),
+])
+def test_capitals_do_not_change_intensity(detector, text, intensity):
+    assert detector.detect_emotion(text)["intensity"] == intensity
+    assert detector.detect_emotion(text.upper())["intensity"] == intensity
+    assert detector.detect_emotion_batch([text.upper()])["intensity"][0] == intensity
+
+
+def baseline_detect(detector, text):
+    """The original substring-based keyword scoring, for comparison"""
+    from backend.emotion_detector import _sentiment
+    
+    text_lower = text.lower()
+    polarity, subjectivity = _sentiment(text)
+    
+    emotion_scores = {}
+    for emotion, keywords in detector.emotion_keywords.items():
+        score = sum(1 for keyword in keywords if keyword in text_lower)
+        if score > 0:
+            emotion_scores[emotion] = score
+    
+    if emotion_scores:
+        primary_emotion = max(emotion_scores, key=emotion_scores.get)
+        confidence = min(emotion_scores[primary_emotion] * 0.25, 1.0)
+    elif polarity > 0.3:
+        primary_emotion, confidence = "happy", polarity
+    elif polarity < -0.3:
+        primary_emotion, confidence = "sad", abs(polarity)
+    else:
+        primary_emotion, confidence = "neutral", 0.5
+    
+    high_count = sum(1 for word in detector.intensity_words["high"] if word in text_lower)
+    low_count = sum(1 for word in detector.intensity_words["low"] if word in text_lower)
+    score = high_count * 2 + text_lower.count("!") * 1.5 + subjectivity * 2 - low_count * 2
+    intensity = "high" if score > 5 else "medium" if score > 2 else "low"
+    
+    return primary_emotion, round(confidence, 2), intensity
+
+
+BASELINE_PHRASES = [
+    "The sadness is overwhelming",
+    "I feel panicky",
+    "I've been tearful all week",
+    "It all feels overwhelming right now",
+    "I am so stressed and worried about tomorrow",
+    "My fears keep me up at night",
+    "I'm extremely angry and frustrated with my family",
+    "I feel a bit lost and confused, I don't know what to do",
+    "I'm kind of nervous but somewhat excited",
+    "Really grateful for my friends, they make me happy",
+    "I miss her, the grief and loneliness are heavy",
+    "I'm terrified of the dark, it's like a nightmare",
+    "Honestly I'm annoyed, sort of irritated",
+    "I'm really delighted with the news!",
+    "Work was fine today",
+]
+
+
+@pytest.mark.parametrize("text", BASELINE_PHRASES)
+def test_keyword_matching_agrees_with_substring_baseline(detector, text):
+    result = detector.detect_emotion(text)
+    
+    assert (result["primary_emotion"], result["confidence"], result["intensity"]) == \
+        baseline_detect(detector, text)
+
+
+def test_keywords_inside_words_do_not_count(detector):
+    # The substring scan read "very" in "everything" and "so" in "also"
+    counts = detector._count_keywords("everything is also fine")
+    assert ("intensity", "high") not in counts
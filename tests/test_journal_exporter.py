@@ -0,0 +1,28 @@
+import json
+
+from backend.mood_tracker import MoodTracker
+from utils.journal_exporter import JournalExporter
+
+
+def test_json_export_is_one_document(tmp_path):
+    tracker = MoodTracker(str(tmp_path))
+    tracker.log_mood("happy", 0.9, "positive", "high", 'a "__mood_entries__" http://x/y', "s1")
+    tracker.log_mood("sad", 0.4, "negative", "low", "second", "s1")
+    
+    exported = JournalExporter(tracker).export_json(days=30)
+    data = json.loads(exported)
+    
+    assert data["total_entries"] == 2
+    assert [entry["emotion"] for entry in data["mood_entries"]] == ["sad", "happy"]
+    assert data["mood_entries"][1]["message_preview"].startswith('a "__mood_entries__"')
+    assert "\\/" not in exported
+    assert data["statistics"]["dominant_emotion"] in ("happy", "sad")
+
+
+def test_csv_export_matches_pandas_output(tmp_path):
+    tracker = MoodTracker(str(tmp_path))
+    tracker.log_mood("happy", 0.9, "positive", "high", 'quoted "text", with comma\nand newline', "s1")
+    tracker.log_mood("sad", 0.4, "negative", "low", "", "s1")
+    
+    expected = tracker.get_recent_moods(days=30, limit=1000).to_csv(index=False)
+    assert JournalExporter(tracker).export_csv(days=30) == expected
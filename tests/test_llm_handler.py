@@ -0,0 +1,140 @@
+import pytest
+
+from backend import llm_handler
+from backend.llm_handler import LLMHandler
+
+
+class FakeClient:
+    """InferenceClient stand-in that streams the given tokens, then optionally fails"""
+    
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+        self.calls = 0
+    
+    def text_generation(self, stream=False, **kwargs):
+        self.calls += 1
+        if stream:
+            return self._stream()
+        return "".join(self.tokens)
+    
+    def _stream(self):
+        yield from self.tokens
+        if self.error is not None:
+            raise self.error
+
+
+@pytest.fixture
+def handler():
+    llm_handler._response_cache.clear()
+    handler = LLMHandler(api_key="test-key", max_retries=1)
+    handler.use_client = True
+    yield handler
+    llm_handler._response_cache.clear()
+
+
+def test_completed_stream_is_cached(handler):
+    handler.client = FakeClient(["I hear you. ", "That sounds hard."])
+    
+    assert "".join(handler.stream_response("prompt")) == "I hear you. That sounds hard."
+    assert handler.generate_response("prompt") == "I hear you. That sounds hard."
+    assert handler.client.calls == 1
+
+
+def test_stream_failing_mid_reply_is_not_cached(handler):
+    handler.client = FakeClient(["I hear you. ", "That sounds"], error=ConnectionError("dropped"))
+    
+    assert "".join(handler.stream_response("prompt")) == "I hear you. That sounds"
+    
+    key = handler._cache_key("prompt", 150, 0.7)
+    assert llm_handler._response_cache.get(key) is None
+    
+    handler.client = FakeClient(["A fresh reply."])
+    assert handler.generate_response("prompt") == "A fresh reply."
+
+
+def test_response_cache_expires_and_evicts(monkeypatch):
+    cache = llm_handler._ResponseCache(maxsize=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr(llm_handler.time, "monotonic", lambda: now[0])
+    
+    cache.set(b"a", "A")
+    cache.set(b"b", "B")
+    assert cache.get(b"a") == "A"  # a is now the most recent
+    cache.set(b"c", "C")
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") == "A"
+    
+    now[0] += 11
+    assert cache.get(b"a") is None
+
+
+def test_count_tokens_estimates_until_tokenizer_is_loaded(handler, monkeypatch):
+    import threading
+    
+    release = threading.Event()
+    loaded = threading.Event()
+    
+    class FakeTokenizer:
+        def encode(self, text, add_special_tokens=False):
+            return text.split()
+    
+    def slow_load(model, token=None):
+        release.wait(5)
+        with llm_handler._tokenizer_lock:
+            llm_handler._tokenizers[model] = FakeTokenizer()
+            llm_handler._tokenizers_loading.discard(model)
+        loaded.set()
+    
+    monkeypatch.setattr(llm_handler, "_tokenizers", {})
+    monkeypatch.setattr(llm_handler, "_tokenizers_loading", set())
+    monkeypatch.setattr(llm_handler, "_load_tokenizer", slow_load)
+    
+    text = "one two three four five six seven eight"
+    assert handler.count_tokens(text) == len(text) // 4 + 1
+    
+    release.set()
+    assert loaded.wait(5)
+    assert handler.count_tokens(text) == 8
+
+
+def test_async_client_setup_failure_falls_back(handler, monkeypatch):
+    import asyncio
+    
+    class BrokenAsyncClient:
+        def __init__(self, **kwargs):
+            pass
+        
+        async def __aenter__(self):
+            raise RuntimeError("session setup failed")
+        
+        async def __aexit__(self, *exc_info):
+            return False
+    
+    monkeypatch.setattr(llm_handler, "HAS_ASYNC_HF_CLIENT", True)
+    monkeypatch.setattr(llm_handler, "AsyncInferenceClient", BrokenAsyncClient, raising=False)
+    monkeypatch.setattr(handler, "_offline_response", lambda *args: "offline reply")
+    
+    assert asyncio.run(handler.agenerate_response("prompt")) == "offline reply"
+
+
+def test_async_reply_survives_client_close_failure(handler, monkeypatch):
+    import asyncio
+    
+    class ClosingFailsClient:
+        def __init__(self, **kwargs):
+            pass
+        
+        async def __aenter__(self):
+            return self
+        
+        async def __aexit__(self, *exc_info):
+            raise RuntimeError("session teardown failed")
+        
+        async def text_generation(self, **kwargs):
+            return "I hear you. And"
+    
+    monkeypatch.setattr(llm_handler, "HAS_ASYNC_HF_CLIENT", True)
+    monkeypatch.setattr(llm_handler, "AsyncInferenceClient", ClosingFailsClient, raising=False)
+    
+    assert asyncio.run(handler.agenerate_response("prompt")) == "I hear you."
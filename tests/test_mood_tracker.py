@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from backend.mood_tracker import MoodTracker
+
+LEGACY_HEADER = "timestamp,date,time,emotion,confidence,sentiment,intensity,message_preview,session_id\n"
+
+
+def write_legacy_csv(data_dir, rows):
+    with open(os.path.join(data_dir, "mood_logs.csv"), "w") as f:
+        f.write(LEGACY_HEADER)
+        f.writelines(rows)
+
+
+def count_rows(tracker):
+    return tracker.conn.execute("SELECT COUNT(*) FROM mood_logs").fetchone()[0]
+
+
+def test_legacy_csv_imported_once_by_concurrent_sessions(tmp_path):
+    write_legacy_csv(tmp_path, [
+        "2024-01-01T10:00:00,2024-01-01,10:00:00,happy,0.9,positive,high,hi,s1\n",
+        "2024-01-02T11:00:00,2024-01-02,11:00:00,sad,0.7,negative,low,,s1\n",
+    ])
+    
+    trackers = []
+    threads = [threading.Thread(target=lambda: trackers.append(MoodTracker(str(tmp_path))))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert count_rows(trackers[0]) == 2
+    assert os.path.exists(tmp_path / "mood_logs.csv.imported")
+    assert not os.path.exists(tmp_path / "mood_logs.csv")
+
+
+def test_unreadable_legacy_csv_is_set_aside(tmp_path):
+    write_legacy_csv(tmp_path, ["not a timestamp,,,happy,0.9,positive,high,hi,s1\n"])
+    
+    tracker = MoodTracker(str(tmp_path))
+    
+    assert count_rows(tracker) == 0
+    assert os.path.exists(tmp_path / "mood_logs.csv.failed")
+    assert not os.path.exists(tmp_path / "mood_logs.csv")
+
+
+def test_statistics_cached_until_the_log_changes(tmp_path):
+    tracker = MoodTracker(str(tmp_path))
+    computed = []
+    compute = tracker._compute_statistics
+    tracker._compute_statistics = lambda df: computed.append(len(df)) or compute(df)
+    
+    tracker.log_mood("happy", 0.9, "positive", "high", "good day")
+    tracker.get_mood_statistics()
+    tracker.get_mood_statistics()
+    assert computed == [1]
+    
+    tracker.log_mood("sad", 0.6, "negative", "low", "rough evening")
+    tracker.get_mood_statistics()
+    assert computed == [1, 2]
+    
+    # A write through another connection (e.g. another process) invalidates too
+    other = sqlite3.connect(tracker.db_file)
+    other.execute("DELETE FROM mood_logs WHERE emotion = 'sad'")
+    other.commit()
+    other.close()
+    tracker.get_mood_statistics()
+    assert computed == [1, 2, 1]
+
+
+def test_insights_survive_a_missing_time_column(tmp_path):
+    tracker = MoodTracker(str(tmp_path))
+    df = pd.DataFrame({
+        "date": ["2024-01-01", "2024-01-02"],
+        "time": [np.nan, np.nan],
+        "emotion": ["happy", "happy"],
+        "sentiment": ["positive", "positive"],
+        "intensity": ["high", "high"],
+    })
+    
+    insights = tracker._generate_insights(df)
+    
+    assert insights[0] == "You've been feeling happy most often lately."
@@ -0,0 +1,74 @@
+import pytest
+
+from backend.response_generator import ResponseGenerator
+
+DISCLAIMER = "*Remember: I'm here for support, but I'm not a therapist or medical professional.*"
+
+
+class FakeStream:
+    """Model token stream that records whether it was closed early"""
+    
+    def __init__(self, tokens):
+        self._tokens = iter(tokens)
+        self.closed = False
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return next(self._tokens)
+    
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def generator():
+    return ResponseGenerator(api_key=None)
+
+
+def stream(generator, tokens, message="I had a rough day at work"):
+    fake = FakeStream(tokens)
+    generator.llm.stream_response = lambda **kwargs: fake
+    response = generator.generate_stream(message)
+    chunks = list(response["response"])
+    return response, chunks, fake
+
+
+def test_safe_stream_is_released_by_sentence(generator):
+    response, chunks, _ = stream(generator, ["I hear", " you. That sounds ", "hard. And"])
+    
+    # The trailing fragment is dropped, like _clean_response does
+    assert chunks == ["I hear you. ", "That sounds hard. "]
+    assert response["is_safe"] is True
+    assert response["final_response"] == "I hear you. That sounds hard."
+    assert generator.conversation_history[-1]["content"] == "I hear you. That sounds hard."
+
+
+def test_unsafe_sentence_keeps_only_safe_alternative(generator):
+    response, chunks, fake = stream(
+        generator, ["I hear you. ", "You have a disorder. ", "Take a walk."]
+    )
+    alternative = generator.safety_filter._get_safe_alternative()
+    
+    assert chunks == ["I hear you. ", "\n\n" + alternative]
+    assert fake.closed
+    assert response["is_safe"] is False
+    assert response["final_response"] == alternative
+    assert generator.conversation_history[-1]["content"] == alternative
+
+
+def test_disclaimer_is_streamed_as_suffix(generator):
+    response, chunks, _ = stream(generator, ["Anxiety is common. ", "You are not alone."])
+    
+    assert chunks[:2] == ["Anxiety is common. ", "You are not alone."]
+    assert chunks[2] == "\n\n" + DISCLAIMER
+    assert response["final_response"] == "Anxiety is common. You are not alone.\n\n" + DISCLAIMER
+    assert generator.conversation_history[-1]["content"] == response["final_response"]
+
+
+def test_incomplete_only_sentence_is_kept(generator):
+    response, chunks, _ = stream(generator, ["I'm here with you"])
+    
+    assert chunks == ["I'm here with you"]
+    assert response["final_response"] == "I'm here with you"
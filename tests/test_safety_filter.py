@@ -0,0 +1,90 @@
+import re
+
+import pytest
+
+from backend.safety_filter import SafetyFilter
+
+TEXTS = [
+    "",
+    "I had a good day at work",
+    "sometimes i want to die",
+    "i think they'd be better off dead without me",
+    "i went on a diet and feel great",
+    "i've been cutting back on coffee",
+    "you have every right to feel that way",
+    "therapy might be something to explore",
+    "your safety is secure here",
+    "talking to a psychiatrist or a psychologist can help",
+    "this is definitely a hard week",
+    "no reason to live, honestly",
+    "anxiety and depression are common",
+]
+
+
+@pytest.fixture(scope="module")
+def safety():
+    return SafetyFilter()
+
+
+def baseline_any(keywords, text):
+    """The original check: one lowercase substring test per keyword"""
+    text_lower = text.lower()
+    return any(keyword in text_lower for keyword in keywords)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_keyword_patterns_match_substring_checks(safety, text):
+    assert safety.check_crisis(text)["is_crisis"] == baseline_any(safety.crisis_keywords, text)
+    assert safety._is_mental_health_topic(text) == baseline_any(safety.mental_health_terms, text)
+    
+    unsafe = (baseline_any(safety.medical_keywords, text)
+              or baseline_any(safety.prohibited_phrases, text))
+    assert safety.filter_response(text, "")[1] == (not unsafe)
+
+
+def baseline_filter_response(safety, response):
+    """The original filter_response, which lowercased the response for every check"""
+    if baseline_any(safety.medical_keywords, response) or baseline_any(safety.prohibited_phrases, response):
+        return safety._get_safe_alternative(), False
+    if baseline_any(safety.mental_health_terms, response):
+        response = safety._add_disclaimer(response)
+    return response, True
+
+
+@pytest.mark.parametrize("text", [text.upper() for text in TEXTS] + [text.title() for text in TEXTS])
+def test_keyword_patterns_ignore_case_like_lowercasing(safety, text):
+    assert safety.check_crisis(text)["is_crisis"] == baseline_any(safety.crisis_keywords, text)
+    assert safety.filter_response(text, "") == baseline_filter_response(safety, text)
+
+
+def baseline_sanitize(text):
+    """The original three sequential substitutions"""
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[link removed]', text)
+    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '[email removed]', text)
+    text = re.sub(r'(\+\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}', '[phone removed]', text)
+    return text
+
+
+@pytest.mark.parametrize("text", [
+    "Take a deep breath, you've got this.",
+    "See https://example.org/help?q=1 for more",
+    "Read http://a.com/x(y), then rest",
+    "Write to someone@example.com or call 555-123-4567",
+    "Call +1 (555) 123-4567 today",
+    "https://user@example.com/page is not an email",
+    "mail me at bob@mail.co.uk, or http://bob.example",
+    "I slept 8 hours and walked 10000 steps",
+    "ref 2024.01.15 and 555.123.4567",
+])
+def test_single_pass_sanitize_matches_sequential_substitutions(safety, text):
+    assert safety.sanitize_output(text) == baseline_sanitize(text)
+
+
+@pytest.mark.parametrize("text", [
+    "a", "ab", "aab", "abc", "aaaaaaab", "abababab", "zzz!", "hi", "!!!!!!!!",
+    "aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa?",
+    "I feel okay", "   tired",
+])
+def test_gibberish_check_matches_set_size(safety, text):
+    expected = len(set(text)) < 3 or text.count(text[0]) > len(text) * 0.7
+    assert safety._is_gibberish(text) == expected
@@ -0,0 +1,145 @@
+import time
+
+import pytest
+
+from utils import translator
+from utils.translator import TranslationHandler
+
+
+class FakeResult:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeTranslator:
+    """googletrans.Translator stand-in: "<dest>text", and "boom" fails"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def translate(self, text, dest="en", src="auto"):
+        self.calls.append((text, dest, src))
+        src.lower()  # as googletrans does, so a missing source fails like it would
+        texts = text if isinstance(text, list) else [text]
+        if "boom" in texts:
+            raise ConnectionError("translation service unavailable")
+        results = [FakeResult(f"<{dest}>{t}") for t in texts]
+        return results if isinstance(text, list) else results[0]
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    fake = FakeTranslator()
+    monkeypatch.setattr(translator, "_get_translator", lambda: fake)
+    monkeypatch.setattr(translator, "TRANSLATION_CACHE_DB", str(tmp_path / "translations.db"))
+    monkeypatch.setattr(translator, "_next_purge", 0)
+    translator._cache_db.cache_clear()
+    translator._memory_cache.clear()
+    yield fake
+    conn = translator._cache_db()
+    if conn is not None:
+        conn.close()
+    translator._cache_db.cache_clear()
+    translator._memory_cache.clear()
+
+
+def test_expired_translations_are_not_served(fake, monkeypatch):
+    handler = TranslationHandler()
+    assert handler.translate("hello", "es") == "<es>hello"
+    
+    later = time.time() + (translator.TRANSLATION_RETENTION_DAYS + 1) * 86400
+    monkeypatch.setattr(translator.time, "time", lambda: later)
+    translator._memory_cache.clear()
+    
+    assert handler.translate("hello", "es") == "<es>hello"
+    assert len(fake.calls) == 2
+
+
+def test_purge_removes_old_rows(fake):
+    handler = TranslationHandler()
+    handler.translate("hello", "es")
+    conn = translator._cache_db()
+    conn.execute("UPDATE translations SET created = created - ?", (10 * 86400,))
+    conn.commit()
+    
+    assert translator.purge_translation_cache(days=5)
+    assert conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] == 0
+    assert not translator._memory_cache
+
+
+def test_batch_accepts_missing_source_language(fake):
+    assert TranslationHandler().translate_batch(["hola"], "EN-us", src_lang=None) == ["<en>hola"]
+    assert fake.calls == [(["hola"], "en", "auto")]
+
+
+def test_missing_source_language_means_auto_detect(fake):
+    assert TranslationHandler().translate("hola", "en", src_lang=None) == "<en>hola"
+    assert fake.calls == [("hola", "en", "auto")]
+
+
+def test_locale_spellings_are_normalized(fake):
+    handler = TranslationHandler()
+    
+    assert handler.translate("hello", "en-US", "EN") == "hello"
+    assert handler.translate("hello", "zh-CN") == "<zh-cn>hello"
+    assert not [call for call in fake.calls if call[1] == "en"]
+    assert handler.get_language_name("en-US") == "english"
+    assert translator.get_language_emoji("zh-CN") == "🇨🇳"
+    assert translator.get_language_emoji("xx-YY") == "🌐"
+
+
+def test_repeated_translation_is_served_from_memory(fake):
+    handler = TranslationHandler()
+    
+    assert handler.translate("hello", "es") == "<es>hello"
+    assert handler.translate("  hello ", "es") == "<es>hello"
+    assert len(fake.calls) == 1
+
+
+def test_persisted_translation_survives_memory_cache_loss(fake):
+    TranslationHandler().translate("hello", "es")
+    translator._memory_cache.clear()  # as after a restart
+    
+    assert TranslationHandler().translate("hello", "es") == "<es>hello"
+    assert len(fake.calls) == 1
+
+
+def test_failed_translation_is_not_cached(fake, monkeypatch):
+    handler = TranslationHandler()
+    assert handler.translate("boom", "es") is None
+    
+    monkeypatch.setattr(fake, "translate", lambda text, dest, src: FakeResult("recovered"))
+    assert handler.translate("boom", "es") == "recovered"
+
+
+def test_memory_cache_is_bounded(fake, monkeypatch):
+    monkeypatch.setattr(translator, "MEMORY_CACHE_SIZE", 2)
+    handler = TranslationHandler()
+    for word in ("a", "b", "a", "c"):
+        handler.translate(word, "es")
+    
+    assert sorted(translator._memory_cache.values()) == ["<es>a", "<es>c"]
+
+
+def test_batch_keeps_order_with_mixed_hits_and_misses(fake, monkeypatch):
+    monkeypatch.setattr(translator, "BATCH_SIZE", 2)
+    handler = TranslationHandler()
+    handler.translate("b", "es")
+    handler.translate("d", "es")
+    fake.calls.clear()
+    
+    results = handler.translate_batch(["a", "b", "", "c", "d", "  ", "e"], "es")
+    
+    assert results == ["<es>a", "<es>b", None, "<es>c", "<es>d", None, "<es>e"]
+    assert fake.calls == [(["a", "c"], "es", "en"), (["e"], "es", "en")]
+
+
+def test_failed_batch_is_not_cached(fake, monkeypatch):
+    monkeypatch.setattr(translator, "BATCH_SIZE", 2)
+    handler = TranslationHandler()
+    
+    assert handler.translate_batch(["a", "boom", "c"], "es") == [None, None, "<es>c"]
+    fake.calls.clear()
+    
+    assert handler.translate_batch(["a", "c"], "es") == ["<es>a", "<es>c"]
+    assert fake.calls == [(["a"], "es", "en")]
@@ -2,21 +2,60 @@ import json
 import os
 import random
 from datetime import datetime
-from typing import List, Dict
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
-def load_wellness_tips(filepath: str = "data/wellness_tips.json") -> List[str]:
-    """Load wellness tips from JSON file"""
+# Activity suggestion per emotion
+EMOTION_SUGGESTIONS = {
+    "sad": "Consider going for a walk or calling a friend. Sometimes movement and connection help.",
+    "anxious": "Try a 5-minute breathing exercise. Focus on slow, deep breaths.",
+    "angry": "Physical activity might help. Consider going for a run or doing some stretching.",
+    "happy": "Enjoy this feeling! Maybe share your joy with someone you care about.",
+    "fearful": "Ground yourself by naming 5 things you can see, 4 you can touch, 3 you can hear.",
+    "confused": "Write down your thoughts. Sometimes seeing them on paper helps clarify things.",
+    "neutral": "Check in with yourself. How are you really feeling right now?"
+}
+
+# Chart color per emotion
+EMOTION_COLORS = {
+    "sad": "#6B8E23",
+    "anxious": "#FF8C00",
+    "angry": "#DC143C",
+    "happy": "#32CD32",
+    "fearful": "#9370DB",
+    "confused": "#4682B4",
+    "neutral": "#808080"
+}
+
+# Emoji mood scale for user selection
+MOOD_EMOJI_SCALE = (
+    {"emoji": "😢", "label": "Very Sad", "value": "very_sad"},
+    {"emoji": "😔", "label": "Sad", "value": "sad"},
+    {"emoji": "😐", "label": "Neutral", "value": "neutral"},
+    {"emoji": "🙂", "label": "Good", "value": "good"},
+    {"emoji": "😊", "label": "Very Good", "value": "very_good"}
+)
+
+@lru_cache(maxsize=4)
+def load_wellness_tips(filepath: str = "data/wellness_tips.json") -> Tuple[str, ...]:
+    """
+    Load wellness tips from JSON file (written with the defaults on first use if missing)
+    
+    Parsed once per path; save_wellness_tips clears the cache.
+    """
     
     try:
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get("tips", [])
+        if not os.path.exists(filepath):
+            save_wellness_tips(get_default_wellness_tips(), filepath)
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            return tuple(data.get("tips", []))
     except Exception as e:
         print(f"Error loading wellness tips: {e}")
     
     # Return default tips if file not found
-    return get_default_wellness_tips()
+    return tuple(get_default_wellness_tips())
 
 def get_default_wellness_tips() -> List[str]:
     """Return default wellness tips"""
@@ -51,6 +90,7 @@ def save_wellness_tips(tips: List[str], filepath: str = "data/wellness_tips.json
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         with open(filepath, 'w') as f:
             json.dump({"tips": tips}, f, indent=2)
+        load_wellness_tips.cache_clear()
         return True
     except Exception as e:
         print(f"Error saving wellness tips: {e}")
@@ -100,28 +140,12 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = "...") -> str:
 def get_emotion_suggestion(emotion: str) -> str:
     """Get activity suggestion based on emotion"""
     
-    suggestions = {
-        "sad": "Consider going for a walk or calling a friend. Sometimes movement and connection help.",
-        "anxious": "Try a 5-minute breathing exercise. Focus on slow, deep breaths.",
-        "angry": "Physical activity might help. Consider going for a run or doing some stretching.",
-        "happy": "Enjoy this feeling! Maybe share your joy with someone you care about.",
-        "fearful": "Ground yourself by naming 5 things you can see, 4 you can touch, 3 you can hear.",
-        "confused": "Write down your thoughts. Sometimes seeing them on paper helps clarify things.",
-        "neutral": "Check in with yourself. How are you really feeling right now?"
-    }
-    
-    return suggestions.get(emotion, suggestions["neutral"])
+    return EMOTION_SUGGESTIONS.get(emotion, EMOTION_SUGGESTIONS["neutral"])
 
-def create_mood_emoji_scale() -> List[Dict[str, str]]:
+def create_mood_emoji_scale() -> Tuple[Dict[str, str], ...]:
     """Create emoji mood scale for user selection"""
     
-    return [
-        {"emoji": "😢", "label": "Very Sad", "value": "very_sad"},
-        {"emoji": "😔", "label": "Sad", "value": "sad"},
-        {"emoji": "😐", "label": "Neutral", "value": "neutral"},
-        {"emoji": "🙂", "label": "Good", "value": "good"},
-        {"emoji": "😊", "label": "Very Good", "value": "very_good"}
-    ]
+    return MOOD_EMOJI_SCALE
 
 def validate_api_key(key: str, key_type: str = "huggingface") -> bool:
     """Basic validation for API keys"""
@@ -139,35 +163,28 @@ def format_mood_chart_data(mood_stats: Dict) -> Dict:
     
     emotion_dist = mood_stats.get("emotion_distribution", {})
     
+    labels, values, colors = [], [], []
+    for emotion, count in emotion_dist.items():
+        labels.append(emotion)
+        values.append(count)
+        colors.append(EMOTION_COLORS.get(emotion, "#808080"))
+    
     return {
-        "labels": list(emotion_dist.keys()),
-        "values": list(emotion_dist.values()),
-        "colors": [get_emotion_color(e) for e in emotion_dist.keys()]
+        "labels": labels,
+        "values": values,
+        "colors": colors
     }
 
 def get_emotion_color(emotion: str) -> str:
     """Get color for emotion (for charts)"""
     
-    colors = {
-        "sad": "#6B8E23",
-        "anxious": "#FF8C00",
-        "angry": "#DC143C",
-        "happy": "#32CD32",
-        "fearful": "#9370DB",
-        "confused": "#4682B4",
-        "neutral": "#808080"
-    }
-    
-    return colors.get(emotion, "#808080")
+    return EMOTION_COLORS.get(emotion, "#808080")
 
 def estimate_reading_time(text: str, wpm: int = 200) -> str:
     """Estimate reading time for text"""
     
-    word_count = len(text.split())
+    # Words ~ separators + 1; an estimate anyway, so skip building the word list
+    word_count = text.count(" ") + text.count("\n") + 1
     minutes = max(1, round(word_count / wpm))
     
     return f"{minutes} min read"
-
-# Initialize wellness tips file on first import
-if not os.path.exists("data/wellness_tips.json"):
-    save_wellness_tips(get_default_wellness_tips())
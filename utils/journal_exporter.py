@@ -1,8 +1,26 @@
+import csv
+import io
 import json
 import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
-import io
+
+# orjson encodes much faster than the stdlib json module; used when installed
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+def _dumps(data) -> str:
+    """Indented JSON text (orjson if available, else json)"""
+    if HAS_ORJSON:
+        return orjson.dumps(
+            data,
+            default=str,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    return json.dumps(data, indent=2, default=str)
 
 class JournalExporter:
     """
@@ -13,29 +31,39 @@ class JournalExporter:
     def __init__(self, mood_tracker):
         self.mood_tracker = mood_tracker
     
+    def _collect(self, days: int, include_stats: bool = True):
+        """
+        Entries for the export period plus (optionally) their stats and trends
+        
+        All three come from one read of the log. Returns (mood_df, stats, trends);
+        stats and trends are None when not requested.
+        """
+        if not include_stats:
+            return self.mood_tracker.get_recent_moods(days=days, limit=1000), None, None
+        
+        bundle = self.mood_tracker.get_dashboard_bundle(
+            days=days, limit=1000, columns=self.mood_tracker.COLUMNS
+        )
+        return bundle["recent"], bundle["stats"], bundle["trends"]
+    
     def export_json(self, days: int = 30, include_stats: bool = True) -> str:
         """
         Export journal as JSON
         """
         try:
-            mood_df = self.mood_tracker.get_recent_moods(days=days, limit=1000)
+            mood_df, stats, trends = self._collect(days, include_stats)
             
             if mood_df.empty:
-                return json.dumps({"error": "No data to export"}, indent=2)
-            
-            mood_records = mood_df.to_dict('records')
+                return _dumps({"error": "No data to export"})
             
             export_data = {
                 "export_date": datetime.now().isoformat(),
                 "period_days": days,
-                "total_entries": len(mood_records),
-                "mood_entries": mood_records
+                "total_entries": len(mood_df),
+                "mood_entries": self._records(mood_df)
             }
             
             if include_stats:
-                stats = self.mood_tracker.get_mood_statistics(days=days)
-                trends = self.mood_tracker.get_mood_trends(days=days)
-                
                 export_data["statistics"] = {
                     "dominant_emotion": stats.get("dominant_emotion"),
                     "average_confidence": stats.get("average_confidence"),
@@ -45,23 +73,37 @@ class JournalExporter:
                     "insights": trends.get("insights", [])
                 }
             
-            return json.dumps(export_data, indent=2, default=str)
+            return _dumps(export_data)
         
         except Exception as e:
-            return json.dumps({"error": f"Export failed: {str(e)}"}, indent=2)
+            return _dumps({"error": f"Export failed: {str(e)}"})
+    
+    def _records(self, mood_df: pd.DataFrame) -> List[Dict]:
+        """
+        Entries as plain JSON-ready dicts
+        
+        pandas encodes the column arrays in C; decoding that gives built-in types
+        (missing values become None, dates ISO strings) for one _dumps of the export.
+        """
+        return json.loads(mood_df.to_json(orient='records', date_format='iso'))
     
     def export_csv(self, days: int = 30) -> str:
         """
         Export journal as CSV
         """
         try:
-            mood_df = self.mood_tracker.get_recent_moods(days=days, limit=1000)
+            rows = self.mood_tracker.get_recent_moods_as_rows(days=days, limit=1000)
             
-            if mood_df.empty:
+            if not rows:
                 return "No data to export"
             
+            # Rows go straight from the database cursor to the csv writer, no DataFrame.
+            # csv only writes to file objects, so unlike DataFrame.to_csv() (which
+            # returns text when given no path) it needs the StringIO buffer.
             csv_buffer = io.StringIO()
-            mood_df.to_csv(csv_buffer, index=False)
+            writer = csv.DictWriter(csv_buffer, fieldnames=list(rows[0]), lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
             return csv_buffer.getvalue()
         
         except Exception as e:
@@ -72,14 +114,11 @@ class JournalExporter:
         Export as formatted text report
         """
         try:
-            mood_df = self.mood_tracker.get_recent_moods(days=days, limit=1000)
+            mood_df, stats, trends = self._collect(days)
             
             if mood_df.empty:
                 return "No data to export"
             
-            stats = self.mood_tracker.get_mood_statistics(days=days)
-            trends = self.mood_tracker.get_mood_trends(days=days)
-            
             report = []
             report.append("=" * 60)
             report.append("MINDFUL COMPANION - MOOD JOURNAL REPORT")
@@ -98,20 +137,18 @@ class JournalExporter:
             report.append("-" * 60)
             report.append("EMOTION DISTRIBUTION")
             report.append("-" * 60)
-            emotion_dist = stats.get('emotion_distribution', {})
-            for emotion, count in sorted(emotion_dist.items(), key=lambda x: x[1], reverse=True):
-                percentage = (count / len(mood_df)) * 100
-                report.append(f"{emotion.title():<15} {count:>5} entries  ({percentage:.1f}%)")
+            report.extend(self._distribution_lines(
+                stats.get('emotion_distribution', {}), len(mood_df), by_count=True
+            ))
             
             report.append("")
             
             report.append("-" * 60)
             report.append("SENTIMENT BREAKDOWN")
             report.append("-" * 60)
-            sentiment_dist = stats.get('sentiment_distribution', {})
-            for sentiment, count in sentiment_dist.items():
-                percentage = (count / len(mood_df)) * 100
-                report.append(f"{sentiment.title():<15} {count:>5} entries  ({percentage:.1f}%)")
+            report.extend(self._distribution_lines(
+                stats.get('sentiment_distribution', {}), len(mood_df)
+            ))
             
             report.append("")
             
@@ -128,10 +165,14 @@ class JournalExporter:
             report.append("RECENT MOOD ENTRIES")
             report.append("-" * 60)
             
-            for idx, row in mood_df.head(20).iterrows():
-                report.append(f"\n[{row['date']} {row['time']}]")
-                report.append(f"Emotion: {row['emotion'].title()} | Sentiment: {row['sentiment'].title()}")
-                report.append(f"Message: {row.get('message_preview', '')[:80]}...")
+            # One string per entry, built column-wise instead of row by row
+            recent = mood_df.head(20).fillna('')
+            report.extend(
+                "\n[" + recent['date'].astype(str) + " " + recent['time'].astype(str) + "]\n"
+                + "Emotion: " + recent['emotion'].str.title()
+                + " | Sentiment: " + recent['sentiment'].str.title() + "\n"
+                + "Message: " + recent['message_preview'].astype(str).str.slice(0, 80) + "..."
+            )
             
             report.append("\n" + "=" * 60)
             report.append("END OF REPORT")
@@ -142,6 +183,18 @@ class JournalExporter:
         except Exception as e:
             return f"Export failed: {str(e)}"
     
+    def _distribution_lines(self, distribution: Dict[str, int], total: int, by_count: bool = False) -> List[str]:
+        """'Label   count entries  (pct%)' lines, optionally most frequent first"""
+        counts = pd.Series(distribution, dtype='int64')
+        if by_count:
+            counts = counts.sort_values(ascending=False, kind='stable')
+        percentages = counts / total * 100
+        labels = counts.index.astype(str).str.title()
+        return [
+            f"{label:<15} {count:>5} entries  ({percentage:.1f}%)"
+            for label, count, percentage in zip(labels, counts.values, percentages.values)
+        ]
+    
     def export_conversation_log(self, messages: List[Dict]) -> str:
         """
         Export current conversation as text
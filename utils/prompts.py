@@ -1,4 +1,7 @@
-from typing import List, Dict, Optional
+import logging
+from typing import Callable, List, Dict, Optional
+
+logger = logging.getLogger(__name__)
 
 class PromptBuilder:
     """
@@ -6,8 +9,7 @@ class PromptBuilder:
     Ensures supportive, safe, non-clinical responses
     """
     
-    def __init__(self):
-        self.system_prompt = """You are a compassionate mental wellness companion. Your role is to:
+    SYSTEM_PROMPT = """You are a compassionate mental wellness companion. Your role is to:
 
 - Listen actively and validate emotions
 - Provide supportive, non-judgmental responses
@@ -27,10 +29,48 @@ Guidelines:
 
 If someone is in crisis, immediately suggest professional crisis resources."""
     
+    # Prompt layout: the header is rendered once per emotion, the rest per message
+    HEADER_TEMPLATE = "{system}\n\nCurrent user emotion: {emotion}\n{guidance}"
+    PROMPT_TEMPLATE = "{header}{history}\n\nUser: {user}\n\nRespond with empathy and support:"
+    
+    # How each message role is labelled in the prompt (anything else is the assistant)
+    _ROLE_LABELS = {"user": "User"}
+    
+    # Context-specific guidance for each emotion
+    EMOTION_GUIDANCE = {
+        "sad": """The user is feeling sad. Acknowledge their pain, validate their feelings, 
+            and gently encourage them without dismissing their emotions. Suggest small, 
+            manageable self-care activities.""",
+        
+        "anxious": """The user is feeling anxious. Help them feel grounded. Suggest 
+            breathing exercises or grounding techniques. Remind them this feeling is temporary.""",
+        
+        "angry": """The user is feeling angry. Validate that anger is a normal emotion. 
+            Help them identify what triggered it. Suggest healthy ways to process these feelings.""",
+        
+        "happy": """The user is feeling happy! Celebrate with them. Ask what contributed 
+            to these positive feelings. Encourage them to savor this moment.""",
+        
+        "fearful": """The user is feeling fearful. Provide reassurance. Help them feel 
+            safe. Break down their fears into manageable pieces. Remind them of their strength.""",
+        
+        "confused": """The user is feeling confused. Help them organize their thoughts. 
+            Ask clarifying questions. Break things down step by step.""",
+        
+        "neutral": """Engage warmly and naturally. Ask open-ended questions to understand 
+            how they're really feeling."""
+    }
+    
+    # System prompt + emotion guidance, rendered once per emotion on first use
+    # (shared by all builders; it only depends on the constants above)
+    _headers = {}
+    
     def build_prompt(self,
                     user_message: str,
                     emotion: str = "neutral",
-                    conversation_history: Optional[List[Dict]] = None) -> str:
+                    conversation_history: Optional[List[Dict]] = None,
+                    token_counter: Optional[Callable[[str], int]] = None,
+                    max_tokens: int = 1024) -> str:
         """
         Build complete prompt with context
         
@@ -38,70 +78,68 @@ If someone is in crisis, immediately suggest professional crisis resources."""
             user_message: Current user message
             emotion: Detected emotion
             conversation_history: Previous conversation
+            token_counter: Counts tokens in a string; enables the max_tokens budget
+            max_tokens: Oldest history turns are dropped until the prompt fits
         
         Returns:
             Complete prompt string
         """
         
-        # Start with system prompt
-        prompt_parts = [self.system_prompt]
-        
-        # Add emotion context
-        emotion_context = self._get_emotion_context(emotion)
-        prompt_parts.append(f"\nCurrent user emotion: {emotion}\n{emotion_context}")
+        # Fixed part: system prompt and emotion context
+        header = self._headers.get(emotion)
+        if header is None:
+            header = self.HEADER_TEMPLATE.format_map({
+                "system": self.SYSTEM_PROMPT,
+                "emotion": emotion,
+                "guidance": self._get_emotion_context(emotion)
+            })
+            self._headers[emotion] = header
         
         # Add conversation history (if available)
-        if conversation_history:
-            history_text = self._format_history(conversation_history)
-            prompt_parts.append(f"\nConversation history:\n{history_text}")
-        
-        # Add current user message
-        prompt_parts.append(f"\nUser: {user_message}\n\nRespond with empathy and support:")
-        
-        return "\n".join(prompt_parts)
+        history_lines = self._history_lines(conversation_history) if conversation_history else []
+        prompt = self._assemble(header, history_lines, user_message)
+        
+        # Keep within the token budget, dropping the oldest exchange first
+        if token_counter is not None:
+            dropped = 0
+            while history_lines and token_counter(prompt) > max_tokens:
+                history_lines = history_lines[2:]
+                dropped += 2
+                prompt = self._assemble(header, history_lines, user_message)
+            if dropped:
+                logger.debug("Prompt over %d tokens: dropped %d oldest history messages",
+                             max_tokens, dropped)
+        
+        return prompt
+    
+    def _assemble(self, header: str, history_lines: List[str], user_message: str) -> str:
+        """Join the prompt sections"""
+        history_block = ""
+        if history_lines:
+            history_block = "\n\nConversation history:\n" + "\n".join(history_lines)
+        
+        return self.PROMPT_TEMPLATE.format_map({
+            "header": header,
+            "history": history_block,
+            "user": user_message
+        })
     
     def _get_emotion_context(self, emotion: str) -> str:
         """Get context-specific guidance for each emotion"""
-        
-        emotion_guidance = {
-            "sad": """The user is feeling sad. Acknowledge their pain, validate their feelings, 
-            and gently encourage them without dismissing their emotions. Suggest small, 
-            manageable self-care activities.""",
-            
-            "anxious": """The user is feeling anxious. Help them feel grounded. Suggest 
-            breathing exercises or grounding techniques. Remind them this feeling is temporary.""",
-            
-            "angry": """The user is feeling angry. Validate that anger is a normal emotion. 
-            Help them identify what triggered it. Suggest healthy ways to process these feelings.""",
-            
-            "happy": """The user is feeling happy! Celebrate with them. Ask what contributed 
-            to these positive feelings. Encourage them to savor this moment.""",
-            
-            "fearful": """The user is feeling fearful. Provide reassurance. Help them feel 
-            safe. Break down their fears into manageable pieces. Remind them of their strength.""",
-            
-            "confused": """The user is feeling confused. Help them organize their thoughts. 
-            Ask clarifying questions. Break things down step by step.""",
-            
-            "neutral": """Engage warmly and naturally. Ask open-ended questions to understand 
-            how they're really feeling."""
-        }
-        
-        return emotion_guidance.get(emotion, emotion_guidance["neutral"])
+        return self.EMOTION_GUIDANCE.get(emotion, self.EMOTION_GUIDANCE["neutral"])
     
     def _format_history(self, history: List[Dict], max_turns: int = 3) -> str:
         """Format conversation history for context"""
-        
-        # Keep only recent turns
-        recent_history = history[-(max_turns * 2):] if len(history) > max_turns * 2 else history
-        
-        formatted = []
-        for msg in recent_history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            content = msg["content"][:200]  # Truncate long messages
-            formatted.append(f"{role}: {content}")
-        
-        return "\n".join(formatted)
+        return "\n".join(self._history_lines(history, max_turns))
+    
+    def _history_lines(self, history: List[Dict], max_turns: int = 3) -> List[str]:
+        """One "Role: content" line per recent message"""
+        
+        # Keep only recent turns, truncating long messages
+        return [
+            f"{self._ROLE_LABELS.get(msg['role'], 'Assistant')}: {msg['content'][:200]}"
+            for msg in history[-(max_turns * 2):]
+        ]
     
     def build_wellness_tip_prompt(self, category: str = "general") -> str:
         """Build prompt for generating wellness tips"""
@@ -1,7 +1,196 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from googletrans import Translator, LANGUAGES
-from typing import Optional, Dict
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
+# Persistent translation cache, shared by all sessions and restarts. It holds
+# chat text, so entries expire after TRANSLATION_RETENTION_DAYS.
+TRANSLATION_CACHE_DB = os.path.join("data", "translations.db")
+TRANSLATION_RETENTION_DAYS = 30
+_cache_lock = threading.Lock()
+_next_purge = 0  # epoch seconds of the next expired-row sweep in _persist
+
+# Texts sent per request by translate_batch
+BATCH_SIZE = 50
+
+# Texts with fewer words than this are too short to detect reliably
+MIN_DETECTION_WORDS = 3
+
+@lru_cache(maxsize=1)
+def _get_translator() -> Translator:
+    """One Translator (and its HTTP client) shared by all handlers"""
+    return Translator()
+
+# In-memory LRU in front of the persistent cache, keyed by _cache_key digests
+# so long replies are not kept around just to look their translations up
+MEMORY_CACHE_SIZE = 4096
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+def _translate_cached(text: str, dest_lang: str, src_lang: str) -> str:
+    """
+    Translated text, memoized across handlers and sessions
+    
+    Misses fall through to the SQLite cache, then the API. Failures raise and
+    are therefore not cached.
+    """
+    key = _cache_key(text, dest_lang, src_lang)
+    translated = _recall(key)
+    if translated is not None:
+        return translated
+    
+    translated = _load_persisted(key)
+    if translated is None:
+        translated = _get_translator().translate(text, dest=dest_lang, src=src_lang).text
+        _persist(key, translated)
+    _remember(key, translated)
+    return translated
+
+def _recall(key: str) -> Optional[str]:
+    """Translation for a cache key from the in-memory LRU, if present"""
+    with _memory_lock:
+        translated = _memory_cache.get(key)
+        if translated is not None:
+            _memory_cache.move_to_end(key)
+        return translated
+
+def _remember(key: str, translated: str):
+    """Add a translation to the in-memory LRU, evicting the oldest if full"""
+    with _memory_lock:
+        _memory_cache[key] = translated
+        _memory_cache.move_to_end(key)
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def _cache_key(text: str, dest_lang: str, src_lang: str) -> str:
+    """Key of a translation in the persistent cache"""
+    return hashlib.sha1(f"{src_lang}|{dest_lang}|{text}".encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=1)
+def _cache_db() -> Optional[sqlite3.Connection]:
+    """Connection to the translation cache database (expired entries purged), or None"""
+    try:
+        os.makedirs(os.path.dirname(TRANSLATION_CACHE_DB), exist_ok=True)
+        conn = sqlite3.connect(TRANSLATION_CACHE_DB, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, translated TEXT NOT NULL, created INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_created ON translations(created)")
+        conn.execute("DELETE FROM translations WHERE created < ?", (_retention_cutoff(),))
+        conn.commit()
+        return conn
+    except sqlite3.Error as e:
+        logger.warning("Translation cache unavailable: %s", e)
+        return None
+
+def _retention_cutoff(days: int = TRANSLATION_RETENTION_DAYS) -> int:
+    """Epoch seconds before which stored translations are expired"""
+    return int(time.time()) - days * 86400
+
+def _load_persisted(key: str) -> Optional[str]:
+    """Stored, unexpired translation for a cache key, if any"""
+    conn = _cache_db()
+    if conn is None:
+        return None
+    try:
+        with _cache_lock:
+            row = conn.execute("SELECT translated FROM translations WHERE key = ? AND created >= ?",
+                               (key, _retention_cutoff())).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.warning("Translation cache read error: %s", e)
+        return None
+
+def _persist(key: str, translated: str):
+    """Store a translation (replacing an expired copy, if any)"""
+    conn = _cache_db()
+    if conn is None:
+        return
+    global _next_purge
+    try:
+        with _cache_lock:
+            now = int(time.time())
+            conn.execute("INSERT OR REPLACE INTO translations (key, translated, created) VALUES (?, ?, ?)",
+                         (key, translated, now))
+            # Long-running servers drop expired rows hourly, not just at start-up
+            if now >= _next_purge:
+                conn.execute("DELETE FROM translations WHERE created < ?", (_retention_cutoff(),))
+                _next_purge = now + 3600
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning("Translation cache write error: %s", e)
+
+def purge_translation_cache(days: int = TRANSLATION_RETENTION_DAYS) -> bool:
+    """Delete stored translations older than `days` (memory cache included)"""
+    with _memory_lock:
+        _memory_cache.clear()
+    
+    conn = _cache_db()
+    if conn is None:
+        return False
+    try:
+        with _cache_lock:
+            conn.execute("DELETE FROM translations WHERE created < ?", (_retention_cutoff(days),))
+            conn.commit()
+        return True
+    except sqlite3.Error as e:
+        logger.warning("Translation cache purge error: %s", e)
+        return False
+
+# Locale spellings whose base code is not simply the part before the region
+_LANGUAGE_ALIASES = MappingProxyType({
+    "zh": "zh-cn",
+    "zh-cn": "zh-cn",
+    "zh-sg": "zh-cn",
+    "zh-hans": "zh-cn",
+    "zh-tw": "zh-tw",
+    "zh-hk": "zh-tw",
+    "zh-hant": "zh-tw",
+    "nb": "no",
+    "nn": "no"
+})
+
+def _norm(code: str) -> str:
+    """Google Translate code for a language or locale ('en-US', 'EN', 'en_GB' -> 'en')"""
+    code = code.strip().lower().replace("_", "-")
+    return _LANGUAGE_ALIASES.get(code, code.split("-")[0])
+
+# Popular language mappings (name -> code) for the UI
+POPULAR_LANGUAGES = MappingProxyType({
+    "English": "en",
+    "Spanish": "es",
+    "French": "fr",
+    "German": "de",
+    "Italian": "it",
+    "Portuguese": "pt",
+    "Dutch": "nl",
+    "Russian": "ru",
+    "Chinese (Simplified)": "zh-cn",
+    "Japanese": "ja",
+    "Korean": "ko",
+    "Arabic": "ar",
+    "Hindi": "hi",
+    "Turkish": "tr",
+    "Polish": "pl",
+    "Swedish": "sv",
+    "Norwegian": "no",
+    "Danish": "da",
+    "Finnish": "fi",
+    "Greek": "el"
+})
+
 class TranslationHandler:
     """
     Handles multi-language translation using Google Translate
@@ -9,32 +198,7 @@ class TranslationHandler:
     """
     
     def __init__(self):
-        self.translator = Translator()
-        self.available_languages = LANGUAGES
-        
-        # Popular language mappings
-        self.popular_languages = {
-            "English": "en",
-            "Spanish": "es",
-            "French": "fr",
-            "German": "de",
-            "Italian": "it",
-            "Portuguese": "pt",
-            "Dutch": "nl",
-            "Russian": "ru",
-            "Chinese (Simplified)": "zh-cn",
-            "Japanese": "ja",
-            "Korean": "ko",
-            "Arabic": "ar",
-            "Hindi": "hi",
-            "Turkish": "tr",
-            "Polish": "pl",
-            "Swedish": "sv",
-            "Norwegian": "no",
-            "Danish": "da",
-            "Finnish": "fi",
-            "Greek": "el"
-        }
+        self.translator = _get_translator()
     
     def translate(self, text: str, dest_lang: str = "es", src_lang: str = "en") -> Optional[str]:
         """
@@ -52,32 +216,121 @@ class TranslationHandler:
             if not text or len(text.strip()) == 0:
                 return None
             
-            # Translate
-            result = self.translator.translate(text, dest=dest_lang, src=src_lang)
-            return result.text
+            dest_lang = _norm(dest_lang)
+            src_lang = _norm(src_lang) if src_lang else "auto"
+            
+            # Nothing to do (e.g. English -> English, 'en-US' -> 'en')
+            if src_lang == dest_lang:
+                return text
+            
+            # Translate (repeated phrases come from the cache)
+            return _translate_cached(text.strip(), dest_lang, src_lang)
         
         except Exception as e:
-            print(f"Translation error: {e}")
+            logger.warning("Translation error: %s", e)
             return None
     
+    def translate_batch(self,
+                        texts: List[str],
+                        dest_lang: str = "es",
+                        src_lang: str = "en") -> List[Optional[str]]:
+        """
+        Translate several texts with one API request per BATCH_SIZE texts
+        
+        Texts already in the translation cache are not sent again.
+        
+        Returns:
+            Translations in input order; None for empty texts or failed batches
+        """
+        results = [None] * len(texts)
+        dest_lang = _norm(dest_lang)
+        src_lang = _norm(src_lang) if src_lang else "auto"
+        
+        # Serve what we can from the cache; only the misses go to the API
+        misses = []
+        for index, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            text = text.strip()
+            key = _cache_key(text, dest_lang, src_lang)
+            cached = _recall(key)
+            if cached is None:
+                cached = _load_persisted(key)
+            if cached is None:
+                misses.append((index, text, key))
+            else:
+                _remember(key, cached)
+                results[index] = cached
+        
+        for start in range(0, len(misses), BATCH_SIZE):
+            chunk = misses[start:start + BATCH_SIZE]
+            try:
+                translated = self.translator.translate(
+                    [text for _, text, _ in chunk], dest=dest_lang, src=src_lang
+                )
+            except Exception as e:
+                logger.warning("Batch translation error: %s", e)
+                continue
+            
+            for (index, _, key), result in zip(chunk, translated):
+                results[index] = result.text
+                _persist(key, result.text)
+                _remember(key, result.text)
+        
+        return results
+    
+    def clear_cache(self):
+        """Forget all cached translations (in memory and on disk)"""
+        with _memory_lock:
+            _memory_cache.clear()
+        conn = _cache_db()
+        if conn is not None:
+            with _cache_lock:
+                conn.execute("DELETE FROM translations")
+                conn.commit()
+    
     def detect_language(self, text: str) -> Optional[Dict]:
         """
         Detect the language of given text
         
+        The first successful detection in a session is reused for the rest
+        of it (see reset_language_detection). Texts shorter than
+        MIN_DETECTION_WORDS words are not sent; they get the session's
+        selected language with zero confidence, and nothing is remembered.
+        
         Returns:
             Dict with 'lang' code and 'confidence' or None
         """
+        detected = st.session_state.get("detected_lang")
+        if detected is not None:
+            return detected
+        
+        if not text or len(text.split()) < MIN_DETECTION_WORDS:
+            lang = _norm(st.session_state.get("user_language", "en"))
+            return {
+                "lang": lang,
+                "confidence": 0.0,
+                "language_name": LANGUAGES.get(lang, "Unknown")
+            }
+        
         try:
             detection = self.translator.detect(text)
-            return {
-                "lang": detection.lang,
+            lang = _norm(detection.lang)
+            detected = {
+                "lang": lang,
                 "confidence": detection.confidence,
-                "language_name": LANGUAGES.get(detection.lang, "Unknown")
+                "language_name": LANGUAGES.get(lang, "Unknown")
             }
+            st.session_state["detected_lang"] = detected
+            return detected
         except Exception as e:
-            print(f"Language detection error: {e}")
+            logger.warning("Language detection error: %s", e)
             return None
     
+    def reset_language_detection(self):
+        """Detect the language again on the next detect_language call"""
+        st.session_state.pop("detected_lang", None)
+    
     def translate_conversation(self, 
                               user_message: str, 
                               bot_response: str,
@@ -86,10 +339,17 @@ class TranslationHandler:
         """
         Translate both user and bot messages
         
+        user_lang may be "auto" to use the session's detected language.
+        
         Returns:
             Dict with translated messages
         """
         try:
+            if user_lang == "auto":
+                detected = self.detect_language(user_message)
+                user_lang = detected["lang"] if detected else "en"
+            user_lang, bot_lang = _norm(user_lang), _norm(bot_lang)
+            
             # Translate user message to English (if not already)
             if user_lang != "en":
                 user_in_english = self.translate(user_message, dest_lang="en", src_lang=user_lang)
@@ -110,7 +370,52 @@ class TranslationHandler:
             }
         
         except Exception as e:
-            print(f"Conversation translation error: {e}")
+            logger.warning("Conversation translation error: %s", e)
+            return {
+                "user_original": user_message,
+                "user_english": user_message,
+                "bot_english": bot_response,
+                "bot_translated": bot_response
+            }
+    
+    async def atranslate_conversation(self,
+                                      user_message: str,
+                                      bot_response: str,
+                                      user_lang: str = "en",
+                                      bot_lang: str = "es") -> Dict[str, str]:
+        """
+        Async version of translate_conversation
+        
+        The two translations are independent, so both requests are in flight at
+        once. googletrans is blocking, so each runs in a worker thread.
+        """
+        
+        async def translated(text: str, dest_lang: str, src_lang: str, needed: bool) -> Optional[str]:
+            if not needed:
+                return text
+            return await asyncio.to_thread(self.translate, text, dest_lang, src_lang)
+        
+        try:
+            if user_lang == "auto":
+                # Uses session state, so it stays on the calling thread
+                detected = self.detect_language(user_message)
+                user_lang = detected["lang"] if detected else "en"
+            user_lang, bot_lang = _norm(user_lang), _norm(bot_lang)
+            
+            user_in_english, bot_translated = await asyncio.gather(
+                translated(user_message, "en", user_lang, user_lang != "en"),
+                translated(bot_response, user_lang, "en", bot_lang != user_lang)
+            )
+            
+            return {
+                "user_original": user_message,
+                "user_english": user_in_english,
+                "bot_english": bot_response,
+                "bot_translated": bot_translated
+            }
+        
+        except Exception as e:
+            logger.warning("Conversation translation error: %s", e)
             return {
                 "user_original": user_message,
                 "user_english": user_message,
@@ -119,12 +424,17 @@ class TranslationHandler:
             }
     
     def get_language_name(self, lang_code: str) -> str:
-        """Get full language name from code"""
-        return LANGUAGES.get(lang_code, lang_code.upper())
+        """Get full language name from code (any locale spelling, e.g. 'en-US')"""
+        return LANGUAGES.get(_norm(lang_code), lang_code.upper())
     
-    def get_popular_languages(self) -> Dict[str, str]:
+    def get_popular_languages(self) -> Mapping[str, str]:
         """Get popular languages for UI selection"""
-        return self.popular_languages
+        return POPULAR_LANGUAGES
+
+@st.cache_resource
+def get_translation_handler() -> TranslationHandler:
+    """TranslationHandler shared by all sessions (it keeps no per-session state)"""
+    return TranslationHandler()
 
 # Convenience function
 def translate_text(text: str, to_language: str = "es") -> str:
@@ -138,12 +448,11 @@ def translate_text(text: str, to_language: str = "es") -> str:
     Returns:
         Translated text
     """
-    handler = TranslationHandler()
-    translated = handler.translate(text, dest_lang=to_language)
+    translated = get_translation_handler().translate(text, dest_lang=to_language)
     return translated if translated else text
 
 # Language emoji mapping for UI
-LANGUAGE_EMOJIS = {
+LANGUAGE_EMOJIS = MappingProxyType({
     "en": "🇺🇸",
     "es": "🇪🇸",
     "fr": "🇫🇷",
@@ -158,4 +467,8 @@ LANGUAGE_EMOJIS = {
     "ar": "🇸🇦",
     "hi": "🇮🇳",
     "tr": "🇹🇷"
-}
+})
+
+def get_language_emoji(lang_code: str, default: str = "🌐") -> str:
+    """Flag for a language code (any locale spelling, e.g. 'zh-CN')"""
+    return LANGUAGE_EMOJIS.get(_norm(lang_code), default)
@@ -1,52 +1,106 @@
+import re
 import speech_recognition as sr
+from functools import lru_cache
 from typing import Optional, Tuple
 import streamlit as st
 
+# Failed recognitions in a row after which background noise is measured again
+RECALIBRATE_AFTER_FAILURES = 3
+
+# Google's recognizer is as accurate at 16 kHz as at the microphone's native rate
+RECOGNITION_SAMPLE_RATE = 16000
+
+# Seconds a Google Speech Recognition request may take before it is abandoned
+RECOGNITION_TIMEOUT = 15
+
+_PYAUDIO_RE = re.compile(r"PyAudio")
+
+_PYAUDIO_INSTALL_MSG = ("❌ PyAudio not installed. Voice input unavailable on this system.\n"
+                        "To enable: Download PyAudio wheel from https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio "
+                        "and install with pip. For now, use text input.")
+
+_PYAUDIO_INSTALL_STEPS = ("❌ PyAudio not installed. On Windows, install via:\n"
+                          "1. Download from: https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio\n"
+                          "2. Run: pip install <downloaded_file>.whl\n"
+                          "Voice input will use fallback text mode.")
+
+@lru_cache(maxsize=1)
+def _list_microphones() -> Tuple[str, ...]:
+    """Microphone names; PortAudio device enumeration is slow, so it is done once"""
+    return tuple(sr.Microphone.list_microphone_names())
+
+def _downsample(audio: sr.AudioData) -> sr.AudioData:
+    """Resample captured audio to 16 kHz, 16-bit before it is uploaded"""
+    if audio.sample_rate <= RECOGNITION_SAMPLE_RATE:
+        return audio
+    frames = audio.get_raw_data(convert_rate=RECOGNITION_SAMPLE_RATE, convert_width=2)
+    return sr.AudioData(frames, RECOGNITION_SAMPLE_RATE, 2)
+
 class VoiceHandler:
     """
     Handles voice input and speech recognition
     Uses Google Speech Recognition API (free)
     """
     
-    def __init__(self):
-        self.recognizer = sr.Recognizer()
-        self.recognizer.energy_threshold = 4000  # Adjust for ambient noise
-        self.recognizer.dynamic_energy_threshold = True
-        self.recognizer.pause_threshold = 1.0  # Seconds of silence before stopping
+    def _new_recognizer(self, energy_threshold: float = 4000) -> sr.Recognizer:
+        """
+        Recognizer configured for chat-style speech
+        
+        The handler is shared by all sessions, so each call gets its own
+        recognizer (the dynamic energy threshold changes while listening).
+        """
+        recognizer = sr.Recognizer()
+        recognizer.energy_threshold = energy_threshold  # Adjust for ambient noise
+        recognizer.dynamic_energy_threshold = True
+        recognizer.pause_threshold = 1.0  # Seconds of silence before stopping
+        recognizer.operation_timeout = RECOGNITION_TIMEOUT  # Bounds the recognition request
+        return recognizer
     
-    def listen(self, language: str = "en-US", timeout: int = 10) -> Tuple[bool, Optional[str], str]:
+    def listen(self,
+               language: str = "en-US",
+               timeout: int = 10,
+               recalibrate: bool = False) -> Tuple[bool, Optional[str], str]:
         """
         Listen to microphone and convert speech to text
         
         Args:
             language: Language code (e.g., 'en-US', 'es-ES', 'fr-FR')
             timeout: Maximum seconds to wait for speech
+            recalibrate: Measure background noise again even if already done this session
         
         Returns:
             Tuple of (success, text, message)
         """
         try:
             with sr.Microphone() as source:
-                # Adjust for ambient noise
-                st.info("🎤 Adjusting for background noise... Please wait.")
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
+                recognizer = self._calibrated_recognizer(source, recalibrate)
                 
                 st.info("🎤 Listening... Speak now!")
                 
                 # Listen for audio
                 try:
-                    audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=30)
+                    audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=15)
                 except sr.WaitTimeoutError:
                     return False, None, "⏱️ No speech detected. Please try again."
+                finally:
+                    # Keep what the dynamic threshold learned for this session's next call
+                    st.session_state["mic_energy_threshold"] = recognizer.energy_threshold
                 
-                st.info("🔄 Processing your speech...")
+                audio = _downsample(audio)
                 
                 # Recognize speech using Google Speech Recognition
                 try:
-                    text = self.recognizer.recognize_google(audio, language=language)
+                    with st.spinner("🔄 Processing your speech..."):
+                        text = recognizer.recognize_google(audio, language=language)
+                    st.session_state["mic_failures"] = 0
                     return True, text, f"✅ Heard: '{text}'"
                 
+                except TimeoutError:
+                    # operation_timeout hit while reading the response
+                    return False, None, "⏱️ Speech recognition took too long. Please try again."
+                
                 except sr.UnknownValueError:
+                    st.session_state["mic_failures"] = st.session_state.get("mic_failures", 0) + 1
                     return False, None, "❌ Could not understand audio. Please speak clearly and try again."
                 
                 except sr.RequestError as e:
@@ -54,32 +108,48 @@ class VoiceHandler:
         
         except OSError as e:
             error_msg = str(e)
-            if "Could not find PyAudio" in error_msg or "PyAudio" in error_msg:
-                return False, None, ("❌ PyAudio not installed. Voice input unavailable on this system.\n"
-                                    "To enable: Download PyAudio wheel from https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio "
-                                    "and install with pip. For now, use text input.")
+            if _PYAUDIO_RE.search(error_msg):
+                return False, None, _PYAUDIO_INSTALL_MSG
             return False, None, f"❌ Microphone error: {e}. Please check your microphone connection."
         
         except Exception as e:
             error_msg = str(e)
-            if "PyAudio" in error_msg:
-                return False, None, ("❌ PyAudio not installed. Voice input unavailable on this system.\n"
-                                    "To enable: Download PyAudio wheel from https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio "
-                                    "and install with pip. For now, use text input.")
+            if _PYAUDIO_RE.search(error_msg):
+                return False, None, _PYAUDIO_INSTALL_MSG
             return False, None, f"❌ Unexpected error: {e}"
     
-    def is_microphone_available(self) -> bool:
+    def _calibrated_recognizer(self, source, recalibrate: bool = False) -> sr.Recognizer:
+        """
+        Recognizer set to this session's background noise level
+        
+        The 1-second ambient-noise measurement runs on the first listen of a
+        session, when asked to, or after repeated failed recognitions; otherwise
+        the session's stored threshold is reused.
+        """
+        threshold = st.session_state.get("mic_energy_threshold")
+        failures = st.session_state.get("mic_failures", 0)
+        
+        if threshold is not None and not recalibrate and failures < RECALIBRATE_AFTER_FAILURES:
+            return self._new_recognizer(threshold)
+        
+        # Adjust for ambient noise
+        st.info("🎤 Adjusting for background noise... Please wait.")
+        recognizer = self._new_recognizer()
+        recognizer.adjust_for_ambient_noise(source, duration=1)
+        st.session_state["mic_energy_threshold"] = recognizer.energy_threshold
+        st.session_state["mic_failures"] = 0
+        return recognizer
+    
+    def is_microphone_available(self, refresh: bool = False) -> bool:
         """Check if microphone is available"""
-        try:
-            mic_list = sr.Microphone.list_microphone_names()
-            return len(mic_list) > 0
-        except Exception:
-            return False
+        return len(self.get_available_microphones(refresh=refresh)) > 0
     
-    def get_available_microphones(self) -> list:
-        """Get list of available microphones"""
+    def get_available_microphones(self, refresh: bool = False) -> list:
+        """Get list of available microphones (enumerated once; refresh=True to re-scan)"""
+        if refresh:
+            _list_microphones.cache_clear()
         try:
-            return sr.Microphone.list_microphone_names()
+            return list(_list_microphones())
         except Exception:
             return []
     
@@ -87,24 +157,22 @@ class VoiceHandler:
         """Test microphone functionality"""
         try:
             with sr.Microphone() as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                self._new_recognizer().adjust_for_ambient_noise(source, duration=0.5)
                 return True, "✅ Microphone is working!"
         except OSError as e:
-            if "Could not find PyAudio" in str(e):
-                return False, ("❌ PyAudio not installed. On Windows, install via:\n"
-                             "1. Download from: https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio\n"
-                             "2. Run: pip install <downloaded_file>.whl\n"
-                             "Voice input will use fallback text mode.")
+            if _PYAUDIO_RE.search(str(e)):
+                return False, _PYAUDIO_INSTALL_STEPS
             return False, f"❌ No microphone detected. Please connect a microphone. ({e})"
         except Exception as e:
             error_msg = str(e)
-            if "PyAudio" in error_msg:
-                return False, ("❌ PyAudio not installed. On Windows, install via:\n"
-                             "1. Download from: https://www.lfd.uci.edu/~gohlke/pythonlibs/#pyaudio\n"
-                             "2. Run: pip install <downloaded_file>.whl\n"
-                             "Voice input will use fallback text mode.")
+            if _PYAUDIO_RE.search(error_msg):
+                return False, _PYAUDIO_INSTALL_STEPS
             return False, f"❌ Microphone test failed: {e}"
 
+@st.cache_resource
+def get_voice_handler() -> VoiceHandler:
+    """VoiceHandler created once per process (it keeps no per-session state)"""
+    return VoiceHandler()
 
 def voice_to_text(language: str = "en-US") -> Optional[str]:
     """
@@ -116,8 +184,7 @@ def voice_to_text(language: str = "en-US") -> Optional[str]:
     Returns:
         Recognized text or None if failed
     """
-    handler = VoiceHandler()
-    success, text, message = handler.listen(language=language)
+    success, text, message = get_voice_handler().listen(language=language)
     
     if success:
         st.success(message)